@@ -1,6 +1,5 @@
 from flask import Flask
 from flask_cors import CORS
-from flask_socketio import SocketIO
 from app.config import Config
 from flasgger import Swagger
 from app.auth.routes import auth_bp
@@ -8,9 +7,15 @@ from app.movies.routes import movies_bp
 from app.series.routes import series_bp
 from app.uploads.routes import upload_bp
 from app.admin.routes import admin_bp
-from app.extensions import cache, swagger
-
-socketio = SocketIO(cors_allowed_origins="*")
+from app.catalog.routes import catalog_bp
+from app.extensions import socketio, cache, cache_policies, swagger, init_cache_invalidation
+from app.db import init_db
+from app.view_counter import view_counter
+from app.leaderboards import leaderboards
+from app.auth.accounts import password_verifier
+from app.realtime import broadcaster
+from app.analytics import analytics
+from app.home_feed import home_feed
 
 
 
@@ -20,20 +25,31 @@ def create_app():
     app.config.from_object(Config)
 
     CORS(app, origins=["https://ucqire.com", "https://dashboard.ucqire.com"])
-    socketio.init_app(app)
+    socketio.init_app(app, message_queue=app.config['SOCKETIO_MESSAGE_QUEUE'])
     cache.init_app(app)
+    cache_policies.init_app(app)
+    init_cache_invalidation()
     swagger.init_app(app)
+    init_db(app)
+    view_counter.init_app(app)
+    leaderboards.init_app(app)
+    password_verifier.init_app(app)
+    broadcaster.init_app(app)
+    analytics.init_app(app)
+    home_feed.init_app(app)
 
     from app.auth.routes import auth_bp
     from app.movies.routes import movies_bp
     from app.series.routes import series_bp
     from app.uploads.routes import upload_bp
     from app.admin.routes import admin_bp
+    from app.catalog.routes import catalog_bp
 
     app.register_blueprint(auth_bp, url_prefix="/auth")
     app.register_blueprint(movies_bp, url_prefix="/movies")
     app.register_blueprint(series_bp, url_prefix="/series")
     app.register_blueprint(upload_bp, url_prefix="/upload")
     app.register_blueprint(admin_bp, url_prefix="/admin")
+    app.register_blueprint(catalog_bp)
 
     return app
\ No newline at end of file
@@ -1,5 +1,12 @@
-from flask import Blueprint, jsonify, session, request
-from app.db import connect_db_api
+from flask import Blueprint, jsonify, session, request, current_app
+from app.db import get_db_api, get_db_catalog, pool_stats, executor_stats
+from app.view_counter import view_counter
+from app.extensions import cache, cache_policies
+from app.auth.accounts import password_verifier
+from app.realtime import broadcaster
+from app.home_feed import home_feed
+from app.analytics import analytics, totals, breakdown, SOURCES
+from app.leaderboards import leaderboards, WINDOWS
 from functools import wraps
 from flasgger import swag_from
 admin_bp = Blueprint('admin_bp', __name__)
@@ -26,7 +33,7 @@ def main_admin_required(f):
 @admin_required
 @swag_from({
     'tags': ['Admin'],
-    'description': 'Get the site statistics, including total movies and TV series.',
+    'description': 'Get the site statistics, including total movies, TV series, episodes and views. Read from precomputed aggregates.',
     'responses': {
         200: {
             'description': 'Site statistics retrieved successfully',
@@ -36,7 +43,10 @@ def main_admin_required(f):
                         'type': 'object',
                         'properties': {
                             'total_movies': {'type': 'integer', 'description': 'Total number of movies in the database'},
-                            'total_series': {'type': 'integer', 'description': 'Total number of TV series in the database'}
+                            'total_series': {'type': 'integer', 'description': 'Total number of TV series in the database'},
+                            'total_episodes': {'type': 'integer', 'description': 'Total number of episodes in the database'},
+                            'movie_views': {'type': 'integer', 'description': 'Views of all movies (flushed counts)'},
+                            'series_views': {'type': 'integer', 'description': 'Views of all TV series (flushed counts)'}
                         }
                     }
                 }
@@ -46,21 +56,107 @@ def main_admin_required(f):
     }
 })
 def site_stats():
-    conn = connect_db_api()
-    cursor = conn.cursor()
+    counts = totals(get_db_catalog())
+
+    return jsonify({
+        "total_movies": counts['movies'][0],
+        "total_series": counts['tv_series'][0],
+        "total_episodes": counts['episodes'][0],
+        "movie_views": counts['movies'][1],
+        "series_views": counts['tv_series'][1],
+    })
 
-    cursor.execute('SELECT COUNT(*) FROM movies')
-    total_movies = cursor.fetchone()[0]
 
-    cursor.execute('SELECT COUNT(*) FROM tv_series')
-    total_series = cursor.fetchone()[0]
+def _breakdown_response(dimension):
+    source = request.args.get('type', 'movies')
+    if source not in SOURCES:
+        return jsonify({"error": f"type must be one of: {', '.join(SOURCES)}"}), 400
+    max_buckets = current_app.config['ANALYTICS_MAX_BUCKETS']
+    limit = min(max(request.args.get('limit', max_buckets, type=int), 1), max_buckets)
+    rows = breakdown(get_db_catalog(), SOURCES[source], dimension, limit)
+    return jsonify([{dimension: bucket, "items": items, "views": views} for bucket, items, views in rows])
 
-    conn.close()
 
-    return jsonify({
-        "total_movies": total_movies,
-        "total_series": total_series
-    })
+BREAKDOWN_PARAMETERS = [
+    {'name': 'type', 'in': 'query', 'type': 'string', 'enum': ['movies', 'series'], 'description': 'Catalog to break down (default movies)', 'required': False},
+    {'name': 'limit', 'in': 'query', 'type': 'integer', 'description': 'Maximum number of buckets (default and max ANALYTICS_MAX_BUCKETS)', 'required': False}
+]
+
+
+@admin_bp.route("/stats/genres", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Number of titles and total views per genre, most populated first.',
+    'parameters': BREAKDOWN_PARAMETERS,
+    'responses': {
+        200: {'description': 'List of {genre, items, views}', 'content': {'application/json': {}}},
+        400: {'description': 'Invalid type', 'content': {'application/json': {}}}
+    }
+})
+def genre_stats():
+    return _breakdown_response('genre')
+
+
+@admin_bp.route("/stats/years", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Number of titles and total views per release year, newest first (null for titles without a year).',
+    'parameters': BREAKDOWN_PARAMETERS,
+    'responses': {
+        200: {'description': 'List of {year, items, views}', 'content': {'application/json': {}}},
+        400: {'description': 'Invalid type', 'content': {'application/json': {}}}
+    }
+})
+def year_stats():
+    return _breakdown_response('year')
+
+
+@admin_bp.route("/stats/top-viewed", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Most viewed titles with their view counts, all time or over a recent window.',
+    'parameters': [
+        {'name': 'type', 'in': 'query', 'type': 'string', 'enum': ['movies', 'series'], 'description': 'Catalog (default movies)', 'required': False},
+        {'name': 'window', 'in': 'query', 'type': 'string', 'enum': ['all', '24h', '7d'], 'description': 'Ranking window (default all)', 'required': False}
+    ],
+    'responses': {
+        200: {'description': 'List of {id, title_eng, views} in rank order', 'content': {'application/json': {}}},
+        400: {'description': 'Invalid type or window', 'content': {'application/json': {}}}
+    }
+})
+def top_viewed_stats():
+    source = request.args.get('type', 'movies')
+    window = request.args.get('window', 'all')
+    if source not in SOURCES:
+        return jsonify({"error": f"type must be one of: {', '.join(SOURCES)}"}), 400
+    if window not in WINDOWS:
+        return jsonify({"error": f"window must be one of: {', '.join(WINDOWS)}"}), 400
+
+    table = SOURCES[source]
+    cursor, rows = leaderboards.rows(get_db_catalog(), 'most_viewed', table, window, columns=('id', 'title_eng', 'views'))
+    columns = [col[0] for col in cursor.description]
+    id_index, title_index, views_index = (columns.index(name) for name in ('id', 'title_eng', 'views'))
+    return jsonify([
+        {"id": row[id_index], "title_eng": row[title_index], "views": row[views_index]} for row in rows
+    ])
+
+
+@admin_bp.route("/stats/reconcile", methods=["POST"])
+@main_admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Recount the precomputed statistics from the catalog now and fix any drift (also runs periodically).',
+    'responses': {
+        200: {'description': 'Drifted buckets fixed per table, and reconciliation history for this worker', 'content': {'application/json': {}}},
+        403: {'description': 'Only the main admin can reconcile', 'content': {'application/json': {}}}
+    }
+})
+def reconcile_stats():
+    drift = analytics.reconcile()
+    return jsonify({"fixed": drift, "stats": analytics.stats()})
 
 
 @admin_bp.route("/list", methods=["GET"])
@@ -91,13 +187,12 @@ def site_stats():
     }
 })
 def admin_list():
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
 
     cursor.execute('SELECT id, username, role FROM admin')
     admins = [{"id": row[0], "username": row[1], "role": row[2]} for row in cursor.fetchall()]
 
-    conn.close()
     return jsonify(admins)
 
 
@@ -134,7 +229,7 @@ def delete_admin():
     if not admin_id:
         return jsonify({"error": "admin_id required"}), 400
 
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
 
     
@@ -149,6 +244,84 @@ def delete_admin():
 
     cursor.execute('DELETE FROM admin WHERE id=?', (admin_id,))
     conn.commit()
-    conn.close()
 
     return jsonify({"message": "Admin deleted successfully"}), 200
+
+
+@admin_bp.route("/db-pool", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get connection pool statistics for each SQLite database and the native thread pool running SQLite calls.',
+    'responses': {
+        200: {'description': '"pools" keyed by database, "executor" with offloaded call counts and queue wait times', 'content': {'application/json': {}}}
+    }
+})
+def db_pool_stats():
+    return jsonify({"pools": pool_stats(), "executor": executor_stats()})
+
+
+@admin_bp.route("/view-counter", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get write-behind view counter statistics (recorded, flushed, pending).',
+    'responses': {
+        200: {'description': 'View counter statistics', 'content': {'application/json': {}}}
+    }
+})
+def view_counter_stats():
+    return jsonify(view_counter.stats())
+
+
+@admin_bp.route("/cache-stats", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get per-endpoint view cache hit/miss counters and cache backend tier counters for this worker.',
+    'responses': {
+        200: {'description': 'Cache statistics: "endpoints" keyed by endpoint policy, "backend" for the two-tier cache (null for other backends)', 'content': {'application/json': {}}}
+    }
+})
+def cache_stats():
+    backend = getattr(cache.cache, 'stats', None)
+    return jsonify({"endpoints": cache_policies.stats(), "backend": backend() if backend else None})
+
+
+@admin_bp.route("/auth-stats", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get password verification pool statistics for this worker.',
+    'responses': {
+        200: {'description': 'Verified and rejected counts, average hash time and current load', 'content': {'application/json': {}}}
+    }
+})
+def auth_stats():
+    return jsonify(password_verifier.stats())
+
+
+@admin_bp.route("/realtime-stats", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get catalog broadcast statistics for this worker.',
+    'responses': {
+        200: {'description': 'Queued items, emitted messages, flushes and rooms waiting for the next flush', 'content': {'application/json': {}}}
+    }
+})
+def realtime_stats():
+    return jsonify(broadcaster.stats())
+
+
+@admin_bp.route("/home-feed-stats", methods=["GET"])
+@admin_required
+@swag_from({
+    'tags': ['Admin'],
+    'description': 'Get home feed build statistics for this worker.',
+    'responses': {
+        200: {'description': 'Builds, errors, last build time and duration, body size, current ETag and stored codings', 'content': {'application/json': {}}}
+    }
+})
+def home_feed_stats():
+    return jsonify(home_feed.stats())
@@ -0,0 +1,167 @@
+import logging
+import threading
+import time
+import uuid
+from app.db import TABLE_POOLS, SERIES_SCHEMA
+from app.extensions import redis_client
+from app.migrations import STATS_TABLE, expected_stats
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('movies', 'tv_series', 'episodes')
+
+# API name -> table
+SOURCES = {
+    'movies': 'movies',
+    'series': 'tv_series',
+}
+
+# schema holding each table's aggregates on a get_db_catalog() connection
+STATS_SCHEMAS = {
+    'movies': 'main',
+    'tv_series': SERIES_SCHEMA,
+    'episodes': SERIES_SCHEMA,
+}
+
+BREAKDOWN_ORDER = {
+    'genre': 'items DESC, views DESC',
+    'year': 'bucket DESC',
+}
+
+
+def _bucket_key(dimension, bucket):
+    return (dimension, bucket.lower() if isinstance(bucket, str) else bucket)
+
+
+def totals(conn):
+    """``{table: (items, views)}`` from the summary rows, on a ``get_db_catalog()`` connection."""
+    sql = ' UNION ALL '.join(
+        f"SELECT source, items, views FROM {schema}.{STATS_TABLE} WHERE source = '{table}' AND dimension = 'total'"
+        for table, schema in STATS_SCHEMAS.items()
+    )
+    found = {source: (items, views) for source, items, views in conn.execute(sql).fetchall()}
+    return {table: found.get(table, (0, 0)) for table in TABLES}
+
+
+def breakdown(conn, table, dimension, limit):
+    """Non-empty buckets of one dimension as ``[(bucket, items, views)]``."""
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT bucket, items, views FROM {STATS_SCHEMAS[table]}.{STATS_TABLE}
+        WHERE source = ? AND dimension = ? AND items > 0
+        ORDER BY {BREAKDOWN_ORDER[dimension]}
+        LIMIT ?
+    ''', (table, dimension, limit))
+    return [(bucket if bucket != '' else None, items, views) for bucket, items, views in cursor.fetchall()]
+
+
+def reconcile_table(conn, table):
+    """Recompute ``table``'s aggregates and fix the rows that drifted; returns how many did.
+
+    Runs in one IMMEDIATE transaction so no write lands between the scan and the fix.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        expected = {_bucket_key(*key): (key, value) for key, value in expected_stats(conn.cursor(), table).items()}
+        stored = {}
+        for dimension, bucket, items, views in conn.execute(
+                f'SELECT dimension, bucket, items, views FROM {STATS_TABLE} WHERE source = ?', (table,)).fetchall():
+            stored[_bucket_key(dimension, bucket)] = ((dimension, bucket), (items, views))
+
+        stale = [key for key, (_, value) in stored.items() if key not in expected]
+        changed = [entry for key, entry in expected.items() if key not in stored or stored[key][1] != entry[1]]
+        drifted = len(changed) + sum(1 for key in stale if stored[key][1] != (0, 0))
+
+        conn.executemany(
+            f'DELETE FROM {STATS_TABLE} WHERE source = ? AND dimension = ? AND bucket = ?',
+            [(table, *stored[key][0]) for key in stale],
+        )
+        conn.executemany(
+            f'INSERT OR REPLACE INTO {STATS_TABLE} (source, dimension, bucket, items, views) VALUES (?, ?, ?, ?, ?)',
+            [(table, dimension, bucket, items, views) for (dimension, bucket), (items, views) in changed],
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drifted
+
+
+class Analytics:
+    """Periodic reconciliation of the catalog aggregates kept in ``STATS_TABLE``.
+
+    Triggers keep the aggregates exact for writes made through SQLite, but
+    anything that bypasses them (the offline importer, manual edits, a
+    restored backup) leaves them drifting. Every ``interval`` seconds one
+    worker (elected through a Redis key when Redis is available) recomputes
+    them with full scans and fixes the buckets that differ.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._redis = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_key = 'analytics:reconcile'
+        self._stats = {"runs": 0, "drifted_buckets": 0, "errors": 0, "last_run": None, "last_drift": None}
+
+    def init_app(self, app):
+        self._app = app
+        self._redis = redis_client(app)
+        app.extensions['analytics'] = self
+        interval = app.config['ANALYTICS_RECONCILE_INTERVAL']
+        if interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='analytics-reconciler', daemon=True)
+            self._thread.start()
+
+    def _claim(self, interval):
+        if self._redis is None:
+            return True
+        try:
+            # expires slightly early so the next run is not skipped by clock skew
+            return bool(self._redis.set(self._lock_key, uuid.uuid4().hex, nx=True, ex=max(1, int(interval * 0.9))))
+        except Exception as e:
+            logger.warning("Redis unavailable (%s), reconciling analytics in this worker", e)
+            return True
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            if not self._claim(interval):
+                continue
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception("Analytics reconciliation failed")
+
+    def reconcile(self):
+        """Reconcile every table now; returns ``{table: drifted_buckets}``."""
+        pools = self._app.extensions['db_pools']
+        drift = {}
+        for table in TABLES:
+            try:
+                with pools[TABLE_POOLS[table]].connection() as conn:
+                    drift[table] = reconcile_table(conn, table)
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+        found = sum(drift.values())
+        if found:
+            logger.warning("Analytics drift fixed: %s", drift)
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["drifted_buckets"] += found
+            self._stats["last_run"] = time.time()
+            self._stats["last_drift"] = drift
+        return drift
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+analytics = Analytics()
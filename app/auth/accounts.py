@@ -0,0 +1,107 @@
+import threading
+import time
+from werkzeug.security import check_password_hash
+from app.db import get_db_api
+from app.utils.green import in_green_thread
+
+
+def get_admin(username):
+    """The ``admin`` row for ``username`` (or None).
+
+    Always read from SQLite (one probe of the unique username index): the
+    row holds the password hash, which must never sit in a shared or
+    per-worker cache that could outlive a password change or deletion.
+    """
+    cursor = get_db_api().cursor()
+    cursor.execute('SELECT * FROM admin WHERE username=?', (username,))
+    return cursor.fetchone()
+
+
+class VerifierBusy(Exception):
+    pass
+
+
+class PasswordVerifier:
+    """Runs password hash checks off the request path with bounded concurrency.
+
+    At most ``workers`` checks run at once; up to ``max_waiting`` more wait
+    ``wait_timeout`` seconds for a slot and anything beyond that is rejected
+    with ``VerifierBusy``. When requests are served by eventlet green threads
+    the hash runs in eventlet's native thread pool so the hub keeps serving
+    other requests; with OS threads the hash functions release the GIL, so it
+    runs inline in the request thread.
+    """
+
+    def __init__(self):
+        self.workers = 2
+        self.max_waiting = 32
+        self.wait_timeout = 5.0
+        self._slots = None
+        self._execute = None
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"verified": 0, "rejected_busy": 0, "total_ms": 0.0}
+
+    def init_app(self, app):
+        self.workers = app.config['AUTH_HASH_WORKERS']
+        self.max_waiting = app.config['AUTH_HASH_MAX_WAITING']
+        self.wait_timeout = app.config['AUTH_HASH_WAIT_TIMEOUT']
+        self._slots = None
+        app.extensions['password_verifier'] = self
+
+    def _setup(self):
+        # decided on first use: the same app may be served by eventlet or by threads
+        with self._lock:
+            if self._slots is not None:
+                return
+            if in_green_thread():
+                from eventlet import semaphore, tpool
+                self._execute = tpool.execute
+                self._slots = semaphore.BoundedSemaphore(self.workers)
+            else:
+                self._execute = None
+                self._slots = threading.BoundedSemaphore(self.workers)
+
+    def verify(self, password_hash, password):
+        if self._slots is None:
+            self._setup()
+        with self._lock:
+            if self._waiting >= self.workers + self.max_waiting:
+                self._stats["rejected_busy"] += 1
+                raise VerifierBusy()
+            self._waiting += 1
+        try:
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                with self._lock:
+                    self._stats["rejected_busy"] += 1
+                raise VerifierBusy()
+            try:
+                started = time.perf_counter()
+                if self._execute is not None:
+                    ok = self._execute(check_password_hash, password_hash, password)
+                else:
+                    ok = check_password_hash(password_hash, password)
+                with self._lock:
+                    self._stats["verified"] += 1
+                    self._stats["total_ms"] += (time.perf_counter() - started) * 1000
+                return ok
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def stats(self):
+        with self._lock:
+            verified = self._stats["verified"]
+            return {
+                "verified": verified,
+                "rejected_busy": self._stats["rejected_busy"],
+                "avg_ms": round(self._stats["total_ms"] / verified, 2) if verified else None,
+                "in_progress": self._waiting,
+                "workers": self.workers,
+                "mode": None if self._slots is None else 'tpool' if self._execute is not None else 'thread',
+            }
+
+
+password_verifier = PasswordVerifier()
@@ -1,6 +1,7 @@
 from flask import Blueprint, request, session, redirect, url_for, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.db import connect_db_api
+from werkzeug.security import generate_password_hash
+from app.db import get_db_api
+from app.auth.accounts import get_admin, password_verifier, VerifierBusy
 from functools import wraps
 from flasgger import swag_from
 auth_bp = Blueprint('auth_bp', __name__)
@@ -46,7 +47,8 @@ def main_admin_required(f):
     'responses': {
         200: {'description': 'Login successful'},
         401: {'description': 'Invalid credentials'},
-        404: {'description': 'User not found'}
+        404: {'description': 'User not found'},
+        503: {'description': 'Too many logins being verified, retry shortly'}
     }
 })
 def login():
@@ -56,16 +58,17 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username and password required"}), 400
 
-    conn = connect_db_api()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM admin WHERE username=?', (username,))
-    user = cursor.fetchone()
-    conn.close()
+    user = get_admin(username)
 
     if user:
         user_id, username_db, password_hash_db, role, *permissions = user
 
-        if check_password_hash(password_hash_db, password):
+        try:
+            valid = password_verifier.verify(password_hash_db, password)
+        except VerifierBusy:
+            return jsonify({"error": "Too many login attempts in progress, retry shortly"}), 503, {"Retry-After": "1"}
+
+        if valid:
             session['logged_in'] = True
             session['username'] = username_db
             session['role'] = role
@@ -124,12 +127,11 @@ def setup_main_admin():
     username = request.json.get('username')
     password = request.json.get('password')
 
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
 
     cursor.execute('SELECT * FROM admin WHERE role="main_admin"')
     if cursor.fetchone():
-        conn.close()
         return jsonify({"error": "Main admin already exists"}), 400
 
     password_hash = generate_password_hash(password)
@@ -142,7 +144,6 @@ def setup_main_admin():
     ''', (username, password_hash, 'main_admin'))
 
     conn.commit()
-    conn.close()
 
     return jsonify({"message": "Main admin created successfully"}), 201
 
@@ -194,7 +195,7 @@ def create_admin():
 
     password_hash = generate_password_hash(password)
 
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -215,6 +216,5 @@ def create_admin():
     ))
 
     conn.commit()
-    conn.close()
 
     return jsonify({"message": "Admin created successfully"}), 201
@@ -0,0 +1,57 @@
+from flask import current_app
+from app.leaderboards import hydrate
+from app.utils.helpers import row_layout, dumps_json, json_bytes_response
+
+# largest rowid SQLite can store
+MAX_ID = 2 ** 63 - 1
+
+IDS_PARAMETER = {
+    'name': 'ids', 'in': 'query', 'type': 'string', 'required': True,
+    'description': 'Comma separated and/or repeated IDs, returned in this order (at most BATCH_MAX_IDS)',
+}
+
+
+def requested_ids(args):
+    """IDs of a batch lookup in request order, without duplicates: ``(ids, error)``."""
+    ids = []
+    for value in args.getlist('ids'):
+        for part in value.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            # isdigit() alone also accepts non-ASCII digits that int() rejects
+            item_id = int(part) if part.isascii() and part.isdigit() else 0
+            if not 1 <= item_id <= MAX_ID:
+                return None, f"Invalid id: {part}"
+            ids.append(item_id)
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return None, "ids is required"
+    limit = current_app.config['BATCH_MAX_IDS']
+    if len(ids) > limit:
+        return None, f"At most {limit} ids are allowed"
+    return ids, None
+
+
+def fetch_by_ids(conn, table, ids, columns=None):
+    """Rows for ``ids`` from one ``IN`` query, in request order: ``(cursor, rows, missing)``."""
+    cursor, rows = hydrate(conn, table, ids, columns)
+    id_index = [col[0] for col in cursor.description].index('id')
+    found = {row[id_index] for row in rows}
+    return cursor, rows, [item_id for item_id in ids if item_id not in found]
+
+
+def batch_response(cursor, rows, missing, embed=None):
+    """``{"items": [...], "missing": [...]}``; ``embed`` adds ``{key: {id: value}}`` to each item."""
+    layout = row_layout(cursor)
+    if not embed:
+        items = layout.encode_rows(rows)
+    else:
+        items = []
+        for row in rows:
+            item = layout.to_dict(row)
+            for key, values in embed.items():
+                item[key] = values.get(item['id'], [])
+            items.append(item)
+        items = dumps_json(items)
+    return json_bytes_response(b'{"items":' + items + b',"missing":' + dumps_json(missing) + b'}')
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask_caching.backends.base import BaseCache
+from flask_caching.backends.rediscache import RedisCache
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class TwoTierCache(BaseCache):
+    """Bounded in-process LRU in front of the shared Redis cache.
+
+    Reads are served from the local tier for up to ``local_ttl`` seconds, so
+    hot keys cost neither a network round trip nor unpickling. Writes go to
+    both tiers. When Redis errors, the remote tier is skipped for
+    ``retry_after`` seconds and the local tier serves alone, so the API keeps
+    working (per process) instead of failing.
+
+    Other workers see writes after at most ``local_ttl`` seconds, also while
+    Redis is down. Keys starting with one of ``remote_only_prefixes`` (the
+    cache generation tokens) are always read from Redis, so invalidations
+    reach every worker at once; their local copy is only used while Redis
+    is unreachable.
+    """
+
+    def __init__(self, remote, default_timeout=300, local_ttl=5, local_max_entries=1024,
+                 retry_after=5, remote_only_prefixes=(), ignore_delete_many_errors=False):
+        super().__init__(default_timeout=default_timeout, ignore_delete_many_errors=ignore_delete_many_errors)
+        self.remote = remote
+        self.local_ttl = local_ttl
+        self.local_max_entries = local_max_entries
+        self.retry_after = retry_after
+        self.remote_only_prefixes = tuple(remote_only_prefixes)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._remote_down_until = 0.0
+        self._stats = {"local_hits": 0, "remote_hits": 0, "misses": 0, "remote_errors": 0, "local_evictions": 0}
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        remote_kwargs = dict(kwargs)
+        remote_kwargs['socket_timeout'] = config['CACHE_REMOTE_TIMEOUT']
+        remote_kwargs['socket_connect_timeout'] = config['CACHE_REMOTE_TIMEOUT']
+        # fail fast and let the circuit breaker back off instead of retrying per call
+        remote_kwargs['retry'] = Retry(NoBackoff(), 0)
+        remote = RedisCache.factory(app, config, list(args), remote_kwargs)
+        return cls(
+            remote,
+            default_timeout=kwargs.get('default_timeout', 300),
+            local_ttl=config['CACHE_LOCAL_TTL'],
+            local_max_entries=config['CACHE_LOCAL_MAX_ENTRIES'],
+            retry_after=config['CACHE_REMOTE_RETRY_AFTER'],
+            remote_only_prefixes=config['CACHE_REMOTE_ONLY_PREFIXES'],
+            ignore_delete_many_errors=kwargs.get('ignore_delete_many_errors', False),
+        )
+
+    def _count(self, field):
+        with self._lock:
+            self._stats[field] += 1
+
+    # local tier
+
+    def _local_get(self, key):
+        with self._lock:
+            item = self._local.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return value
+
+    def _local_set(self, key, value, timeout):
+        timeout = self._normalize_timeout(timeout)
+        # capped even while Redis is down: other workers cannot see this copy
+        ttl = self.local_ttl if not timeout else min(self.local_ttl, timeout)
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+                self._stats["local_evictions"] += 1
+
+    def _local_delete(self, key):
+        with self._lock:
+            return self._local.pop(key, None) is not None
+
+    # remote tier
+
+    def remote_available(self):
+        return time.monotonic() >= self._remote_down_until
+
+    def _remote(self, method, *args, **kwargs):
+        """Call the Redis tier; returns ``(ok, result)`` and trips the breaker on errors."""
+        if not self.remote_available():
+            return False, None
+        try:
+            return True, getattr(self.remote, method)(*args, **kwargs)
+        except Exception as e:
+            self._remote_down_until = time.monotonic() + self.retry_after
+            self._count("remote_errors")
+            logger.warning("Redis cache unavailable (%s), serving from the local tier for %ss", e, self.retry_after)
+            return False, None
+
+    # cache API
+
+    def _remote_only(self, key):
+        return key.startswith(self.remote_only_prefixes)
+
+    def get(self, key):
+        if self._remote_only(key):
+            ok, value = self._remote('get', key)
+            if ok:
+                self._count("remote_hits" if value is not None else "misses")
+                return value
+            value = self._local_get(key)
+            self._count("local_hits" if value is not None else "misses")
+            return value
+        value = self._local_get(key)
+        if value is not None:
+            self._count("local_hits")
+            return value
+        ok, value = self._remote('get', key)
+        if ok and value is not None:
+            self._count("remote_hits")
+            self._local_set(key, value, self.local_ttl)
+            return value
+        self._count("misses")
+        return None
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def has(self, key):
+        if not self._remote_only(key) and self._local_get(key) is not None:
+            return True
+        ok, result = self._remote('has', key)
+        return bool(ok and result)
+
+    def set(self, key, value, timeout=None):
+        self._local_set(key, value, timeout)
+        ok, result = self._remote('set', key, value, timeout)
+        return result if ok else True
+
+    def set_many(self, mapping, timeout=None):
+        return [key for key, value in mapping.items() if self.set(key, value, timeout)]
+
+    def add(self, key, value, timeout=None):
+        if self.remote_available():
+            ok, added = self._remote('add', key, value, timeout)
+            if ok:
+                if added:
+                    self._local_set(key, value, timeout)
+                return added
+        if self._local_get(key) is not None:
+            return False
+        self._local_set(key, value, timeout)
+        return True
+
+    def delete(self, key):
+        deleted = self._local_delete(key)
+        ok, result = self._remote('delete', key)
+        return bool(result) if ok else deleted
+
+    def delete_many(self, *keys):
+        return [key for key in keys if self.delete(key)]
+
+    def inc(self, key, delta=1):
+        self._local_delete(key)
+        ok, result = self._remote('inc', key, delta)
+        if ok:
+            return result
+        value = (self._local_get(key) or 0) + delta
+        self._local_set(key, value, None)
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        ok, result = self._remote('clear')
+        return result if ok else True
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, local_entries=len(self._local), remote_available=self.remote_available())
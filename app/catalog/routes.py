@@ -0,0 +1,67 @@
+from flask import Blueprint, request, jsonify, current_app
+from app.db import get_db_catalog
+from flasgger import swag_from
+from app.search import search_all, DEFAULT_LIMIT, MAX_LIMIT
+from app.extensions import cached_view, normalize_list, normalize_text
+from app.fields import requested_fields, FIELDS_PARAMETER
+from app.utils.helpers import stream_rows, JSON_MIMETYPE
+from app.compression import encoded_response, ETAG_SUFFIXES
+from app.home_feed import home_feed
+
+catalog_bp = Blueprint('catalog_bp', __name__)
+
+
+@catalog_bp.route("/search", methods=["GET"])
+@cached_view('catalog.search', generations=('movies', 'series'), normalizers={'query': normalize_text, 'fields': normalize_list})
+@swag_from({
+    'tags': ['Search'],
+    'description': 'Full-text search movies and TV series together, ranked by relevance in one list. Each result has a type of "movie" or "series". Words are prefix-matched.',
+    'parameters': [
+        {'name': 'query', 'in': 'query', 'type': 'string', 'description': 'Text to search for', 'required': True},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'description': 'Maximum number of ranked results (default 54, max 200)', 'required': False},
+        {'name': 'offset', 'in': 'query', 'type': 'integer', 'description': 'Number of ranked results to skip', 'required': False},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson'], 'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)', 'required': False},
+        FIELDS_PARAMETER
+    ],
+    'responses': {
+        200: {'description': 'Matching movies and TV series', 'content': {'application/json': {}}},
+        400: {'description': 'Query is required', 'content': {'application/json': {}}}
+    }
+})
+def search():
+    query = request.args.get('query')
+    if not query:
+        return jsonify({"error": "Query is required"}), 400
+    # movies and series share the selectable columns
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
+
+    conn = get_db_catalog()
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    cursor = search_all(conn, query, limit, offset, columns=columns)
+    return stream_rows(cursor)
+
+
+@catalog_bp.route("/home", methods=["GET"])
+@swag_from({
+    'tags': ['Catalog'],
+    'description': 'Landing page feed in one response: movies_latest, movies_most_viewed, series_latest and series_most_viewed, each a list of cards (id, title_eng, imdb, year, poster). Prebuilt in the background; send If-None-Match to revalidate.',
+    'responses': {
+        200: {'description': 'The four sections', 'content': {'application/json': {}}},
+        304: {'description': 'The feed has not changed'}
+    }
+})
+def home():
+    body, etag, variants, _ = home_feed.current()
+    if request.if_none_match:
+        for tag in (etag, *(etag + suffix for suffix in ETAG_SUFFIXES.values())):
+            if request.if_none_match.contains_weak(tag):
+                response = current_app.response_class(status=304)
+                response.set_etag(tag)
+                return response
+    response = encoded_response(body, JSON_MIMETYPE, None, variants)
+    response.set_etag(etag + ETAG_SUFFIXES.get(response.headers.get('Content-Encoding'), ''))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
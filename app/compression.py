@@ -0,0 +1,97 @@
+import zlib
+from flask import current_app, request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# content codings we produce, in order of preference when the client rates them equally
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# suffix added to a strong ETag for each coding, so every representation has its own tag
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gz'}
+
+
+def _gzip(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def compress_variants(body):
+    """Compressed copies of ``body`` worth storing next to it: ``{coding: bytes}``.
+
+    Bodies under ``COMPRESS_MIN_SIZE`` and codings that do not shrink the
+    body are skipped. Runs once per cache fill, so it uses the high
+    ``COMPRESS_GZIP_LEVEL`` / ``COMPRESS_BROTLI_QUALITY`` settings.
+    """
+    config = current_app.config
+    if len(body) < config['COMPRESS_MIN_SIZE']:
+        return {}
+    variants = {}
+    for coding in ENCODINGS:
+        if coding == 'br':
+            data = brotli.compress(body, mode=brotli.MODE_TEXT, quality=config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            data = _gzip(body, config['COMPRESS_GZIP_LEVEL'])
+        if len(data) < len(body):
+            variants[coding] = data
+    return variants
+
+
+def negotiate(available=ENCODINGS):
+    """The coding from ``available`` the client rates highest in Accept-Encoding, or None for identity."""
+    accept = request.accept_encodings
+    best, best_quality = None, 0
+    for coding in available:
+        quality = accept[coding]
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def encoded_response(body, mimetype, headers, variants):
+    """Response for a stored body, sent as the negotiated precompressed variant when there is one."""
+    coding = negotiate(tuple(coding for coding in ENCODINGS if coding in variants)) if variants else None
+    response = Response(variants[coding] if coding else body, mimetype=mimetype, headers=headers)
+    if coding:
+        response.headers['Content-Encoding'] = coding
+    if variants:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def _stream_compressor(coding):
+    config = current_app.config
+    if coding == 'br':
+        compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=config['COMPRESS_STREAM_BROTLI_QUALITY'])
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(config['COMPRESS_STREAM_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress_stream(chunks):
+    """Wrap a streamed body in the negotiated coding: ``(chunks, coding or None)``.
+
+    Each chunk is flushed as it is produced so clients can start decoding the
+    first rows while later ones are still being read from SQLite. Closing the
+    returned iterator closes ``chunks`` (and whatever its ``finally`` releases).
+    """
+    coding = negotiate()
+    if coding is None:
+        return chunks, None
+    process, flush, finish = _stream_compressor(coding)
+
+    def generate():
+        try:
+            for chunk in chunks:
+                data = process(chunk) + flush()
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    return generate(), coding
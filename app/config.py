@@ -3,12 +3,123 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "default_secret_key")
-    
-    
-    CACHE_TYPE = 'RedisCache'
+    # Sessions are signed cookies, valid on any worker that shares SECRET_KEY.
+    SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', '0') == '1'
+    SESSION_COOKIE_SAMESITE = os.getenv('SESSION_COOKIE_SAMESITE', 'Lax')
+    SESSION_COOKIE_DOMAIN = os.getenv('SESSION_COOKIE_DOMAIN') or None
+
+
+    # Two-tier cache: a small in-process LRU in front of Redis. Entries may be stale on other
+    # workers for up to CACHE_LOCAL_TTL seconds (also while Redis is unreachable, when the local
+    # tier serves alone for CACHE_REMOTE_RETRY_AFTER seconds). Generation tokens ('gen:' keys)
+    # are always read from Redis so invalidations and 304s are immediate on every worker.
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'app.cache_backend.TwoTierCache')
     CACHE_REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
     CACHE_REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
     CACHE_REDIS_DB = int(os.getenv('REDIS_DB', 0))
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 5))
+    CACHE_LOCAL_MAX_ENTRIES = int(os.getenv('CACHE_LOCAL_MAX_ENTRIES', 1024))
+    CACHE_REMOTE_TIMEOUT = float(os.getenv('CACHE_REMOTE_TIMEOUT', 0.5))
+    CACHE_REMOTE_RETRY_AFTER = float(os.getenv('CACHE_REMOTE_RETRY_AFTER', 5))
+    CACHE_REMOTE_ONLY_PREFIXES = ('gen:',)
+    # Stampede protection: entries are refreshed early with probability growing towards
+    # expiry (XFetch, scaled by CACHE_EARLY_REFRESH_BETA), and only one caller rebuilds a key.
+    CACHE_EARLY_REFRESH_BETA = float(os.getenv('CACHE_EARLY_REFRESH_BETA', 1.0))
+    CACHE_LOCK_TIMEOUT = int(os.getenv('CACHE_LOCK_TIMEOUT', 10))
+    CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 2))
+    # Listings are invalidated by generation bumps on upload, so they can live for hours.
+    CACHE_LISTING_TIMEOUT = int(os.getenv('CACHE_LISTING_TIMEOUT', 6 * 60 * 60))
+    CACHE_SEARCH_TIMEOUT = int(os.getenv('CACHE_SEARCH_TIMEOUT', 30 * 60))
+    CACHE_NEGATIVE_TIMEOUT = int(os.getenv('CACHE_NEGATIVE_TIMEOUT', 60))
+
+    # Per-endpoint view caching (see app.extensions.cached_view). Keys include the
+    # generations each endpoint depends on, so TTLs only bound memory and view-count staleness.
+    CACHE_IGNORED_ARGS = ('_', 'utm_source', 'utm_medium', 'utm_campaign')
+    CACHE_POLICIES = {
+        'movies.all': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 5000},
+        'movies.by_id': {'timeout': 5 * 60, 'max_entries': 20000, 'negative_timeout': CACHE_NEGATIVE_TIMEOUT},
+        'movies.by_genre': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 2000},
+        'movies.search': {'timeout': CACHE_SEARCH_TIMEOUT, 'max_entries': 10000, 'negative_timeout': CACHE_NEGATIVE_TIMEOUT},
+        'movies.most_viewed': {'timeout': 5 * 60, 'max_entries': 10},
+        'movies.latest': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 10},
+        'series.all': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 5000},
+        'series.by_id': {'timeout': 5 * 60, 'max_entries': 20000, 'negative_timeout': CACHE_NEGATIVE_TIMEOUT},
+        'series.episodes': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 20000},
+        'series.seasons': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 20000},
+        'series.by_genre': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 2000},
+        'series.search': {'timeout': CACHE_SEARCH_TIMEOUT, 'max_entries': 10000, 'negative_timeout': CACHE_NEGATIVE_TIMEOUT},
+        'series.most_viewed': {'timeout': 5 * 60, 'max_entries': 10},
+        'series.latest': {'timeout': CACHE_LISTING_TIMEOUT, 'max_entries': 10},
+        'catalog.search': {'timeout': CACHE_SEARCH_TIMEOUT, 'max_entries': 10000, 'negative_timeout': CACHE_NEGATIVE_TIMEOUT},
+    }
+
+    DATABASE_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, 'data', 'database.db'))
+    DATABASE2_PATH = os.getenv('DATABASE2_PATH', os.path.join(BASE_DIR, 'data', 'data2.db'))
+
+    # apply pending migrations in create_app(); gunicorn runs them once in the master instead
+    DB_AUTO_MIGRATE = os.getenv('DB_AUTO_MIGRATE', '1') == '1'
+
+    # Connections are pooled per database and handed out once per app context.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 16))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+    DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', 5))
+    DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', 256))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 256 * 1024 * 1024))
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 64 * 1024))
+    # Native threads running SQLite calls made from eventlet green threads (0 runs them inline).
+    DB_THREADPOOL_SIZE = int(os.getenv('DB_THREADPOOL_SIZE', 20))
+
+    # Most IDs accepted by one /by-ids batch lookup (resolved with a single IN query).
+    BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', 100))
+
+    # Result sets larger than this are streamed in chunks of this many rows.
+    STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 500))
+
+    # Cached view bodies of at least COMPRESS_MIN_SIZE bytes are stored with gzip (and brotli,
+    # if installed) copies, compressed once per cache fill; streamed results are compressed
+    # per chunk at the cheaper STREAM levels. See benchmarks/bench_compression.py.
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 9))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 9))
+    COMPRESS_STREAM_GZIP_LEVEL = int(os.getenv('COMPRESS_STREAM_GZIP_LEVEL', 5))
+    COMPRESS_STREAM_BROTLI_QUALITY = int(os.getenv('COMPRESS_STREAM_BROTLI_QUALITY', 4))
+
+    # Password hash checks: at most AUTH_HASH_WORKERS run at once per worker process,
+    # AUTH_HASH_MAX_WAITING more may wait AUTH_HASH_WAIT_TIMEOUT seconds, the rest get 503.
+    AUTH_HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', 2))
+    AUTH_HASH_MAX_WAITING = int(os.getenv('AUTH_HASH_MAX_WAITING', 32))
+    AUTH_HASH_WAIT_TIMEOUT = float(os.getenv('AUTH_HASH_WAIT_TIMEOUT', 5))
+
+    # Bulk ingest: rows are upserted in one transaction per chunk.
+    BULK_CHUNK_ROWS = int(os.getenv('BULK_CHUNK_ROWS', 500))
+    BULK_MAX_ROWS = int(os.getenv('BULK_MAX_ROWS', 50000))
+    BULK_MAX_ROW_BYTES = int(os.getenv('BULK_MAX_ROW_BYTES', 64 * 1024))
+
+    # Views are buffered and written to SQLite in one batch every N seconds (0 disables the flusher).
+    VIEW_FLUSH_INTERVAL = float(os.getenv('VIEW_FLUSH_INTERVAL', 5))
+    VIEW_COUNTER_KEY_PREFIX = os.getenv('VIEW_COUNTER_KEY_PREFIX', 'views:pending:')
+
+    # Catalog additions are pushed to SocketIO rooms, coalesced into one message per room
+    # every REALTIME_BATCH_INTERVAL seconds (at most REALTIME_MAX_BATCH items each).
+    # Set SOCKETIO_MESSAGE_QUEUE (e.g. redis://localhost:6379/1) when running several workers.
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE') or None
+    REALTIME_BATCH_INTERVAL = float(os.getenv('REALTIME_BATCH_INTERVAL', 0.5))
+    REALTIME_MAX_BATCH = int(os.getenv('REALTIME_MAX_BATCH', 100))
+
+    # Catalog aggregates are kept exact by triggers; a full recount fixes any drift every N seconds (0 disables).
+    ANALYTICS_RECONCILE_INTERVAL = float(os.getenv('ANALYTICS_RECONCILE_INTERVAL', 6 * 60 * 60))
+    ANALYTICS_MAX_BUCKETS = int(os.getenv('ANALYTICS_MAX_BUCKETS', 500))
+
+    LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', 54))
+    LEADERBOARD_KEY_PREFIX = os.getenv('LEADERBOARD_KEY_PREFIX', 'lb:')
+
+    # /home is served from a prebuilt body: rebuilt HOME_FEED_REFRESH_DELAY seconds after local
+    # uploads/view flushes, and when another worker's changes are seen (checked every
+    # HOME_FEED_CHECK_INTERVAL seconds; 0 disables the refresher and checks on each request).
+    HOME_FEED_CHECK_INTERVAL = float(os.getenv('HOME_FEED_CHECK_INTERVAL', 5))
+    HOME_FEED_REFRESH_DELAY = float(os.getenv('HOME_FEED_REFRESH_DELAY', 1))
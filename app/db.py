@@ -1,14 +1,358 @@
 import sqlite3
-import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from flask import g, current_app
+from app.migrations import run_migrations
+from app.utils.green import in_green_thread
 
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
-def connect_db_api():
-    db_path = os.path.join(BASE_DIR, "../data/database.db")
-    return sqlite3.connect(db_path)
+# catalog table -> pool holding it
+TABLE_POOLS = {
+    'movies': 'api',
+    'tv_series': 'api2',
+    'episodes': 'api2',
+}
 
-def connect_db_api2():
-    db_path = os.path.join(BASE_DIR, "../data/data2.db")
-    return sqlite3.connect(db_path)
+# schema name of DATABASE2_PATH on the 'catalog' pool's connections
+SERIES_SCHEMA = 'series_db'
 
 
+class PoolTimeout(Exception):
+    pass
+
+
+class DBExecutor:
+    """Runs blocking sqlite3 calls in eventlet's native thread pool.
+
+    sqlite3 is not monkey-patched, so a slow query run from a green thread
+    stalls the whole hub (every other request and WebSocket client of the
+    process). Calls made from green threads are handed to ``tpool`` and the
+    green thread yields until they finish; calls from OS threads (dev server,
+    tests, background flushers) run inline.
+    """
+
+    def __init__(self):
+        self.threads = 0
+        self._tpool = None
+        self._lock = threading.Lock()
+        self._stats = {"offloaded": 0, "inline": 0, "wait_s": 0.0, "max_wait_s": 0.0, "exec_s": 0.0}
+
+    def configure(self, threads):
+        self.threads = threads
+        self._tpool = None
+        if threads:
+            try:
+                from eventlet import tpool
+            except ImportError:
+                return
+            tpool.set_num_threads(threads)
+            self._tpool = tpool
+
+    def run(self, fn, *args):
+        if self._tpool is None or not in_green_thread():
+            with self._lock:
+                self._stats["inline"] += 1
+            return fn(*args)
+
+        submitted = time.perf_counter()
+        started = []
+
+        def call():
+            started.append(time.perf_counter())
+            return fn(*args)
+
+        try:
+            return self._tpool.execute(call)
+        finally:
+            done = time.perf_counter()
+            if started:
+                wait = started[0] - submitted
+                with self._lock:
+                    self._stats["offloaded"] += 1
+                    self._stats["wait_s"] += wait
+                    self._stats["max_wait_s"] = max(self._stats["max_wait_s"], wait)
+                    self._stats["exec_s"] += done - started[0]
+
+    def stats(self):
+        with self._lock:
+            offloaded = self._stats["offloaded"]
+            return {
+                "threads": self.threads if self._tpool is not None else 0,
+                "offloaded": offloaded,
+                "inline": self._stats["inline"],
+                "avg_queue_wait_ms": round(self._stats["wait_s"] * 1000 / offloaded, 3) if offloaded else 0.0,
+                "max_queue_wait_ms": round(self._stats["max_wait_s"] * 1000, 3),
+                "avg_exec_ms": round(self._stats["exec_s"] * 1000 / offloaded, 3) if offloaded else 0.0,
+            }
+
+
+db_executor = DBExecutor()
+
+
+class OffloadedCursor(sqlite3.Cursor):
+    """Cursor whose statement execution and fetches go through ``db_executor``.
+
+    Plain iteration (``for row in cursor``) still steps inline; routes fetch
+    with ``fetchall``/``fetchmany``.
+    """
+
+    def execute(self, sql, parameters=()):
+        return db_executor.run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return db_executor.run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return db_executor.run(super().executescript, sql_script)
+
+    def fetchone(self):
+        return db_executor.run(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return db_executor.run(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return db_executor.run(super().fetchall)
+
+
+class OffloadedConnection(sqlite3.Connection):
+    """Connection (passed as ``factory=``) handing out ``OffloadedCursor``s."""
+
+    def cursor(self, factory=OffloadedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        return db_executor.run(super().commit)
+
+    def rollback(self):
+        return db_executor.run(super().rollback)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections for one database file.
+
+    Connections are created lazily up to ``size`` and configured once with the
+    pragmas below, so the file handle, parsed schema, page cache and the
+    per-connection prepared statement cache survive across requests.
+    ``attached`` maps schema names to further database files ATTACHed on
+    every connection, so one query can join tables across files.
+    ``queue`` and ``threading`` are used so the pool turns green once eventlet
+    monkey-patches the process.
+    """
+
+    def __init__(self, name, path, size=16, timeout=30, busy_timeout=5,
+                 cached_statements=256, mmap_size=0, cache_size_kb=2000, attached=None):
+        self.name = name
+        self.path = path
+        self.attached = dict(attached or {})
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._checked_out = 0
+        self._peak_checked_out = 0
+        self._acquired = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=OffloadedConnection,
+        )
+        for schema, path in self.attached.items():
+            conn.execute(f'ATTACH DATABASE ? AS {schema}', (path,))
+        conn.execute('PRAGMA temp_store=MEMORY')
+        for schema in ['main', *self.attached]:
+            conn.execute(f'PRAGMA {schema}.journal_mode=WAL')
+            conn.execute(f'PRAGMA {schema}.synchronous=NORMAL')
+            conn.execute(f'PRAGMA {schema}.mmap_size={int(self.mmap_size)}')
+            conn.execute(f'PRAGMA {schema}.cache_size=-{int(self.cache_size_kb)}')
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.monotonic()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(f"No free connection in pool '{self.name}'")
+                with self._lock:
+                    self._waits += 1
+                    self._wait_time += time.monotonic() - started
+
+        with self._lock:
+            self._acquired += 1
+            self._checked_out += 1
+            self._peak_checked_out = max(self._peak_checked_out, self._checked_out)
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._checked_out -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                self._created -= 1
+            conn.close()
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "checked_out": self._checked_out,
+                "idle": self._idle.qsize(),
+                "peak_checked_out": self._peak_checked_out,
+                "acquired": self._acquired,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+            }
+
+
+def _make_pool(app, name, path, attached=None):
+    return ConnectionPool(
+        name,
+        path,
+        size=app.config['DB_POOL_SIZE'],
+        timeout=app.config['DB_POOL_TIMEOUT'],
+        busy_timeout=app.config['DB_BUSY_TIMEOUT'],
+        cached_statements=app.config['DB_STATEMENT_CACHE'],
+        mmap_size=app.config['DB_MMAP_SIZE'],
+        cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+        attached=attached,
+    )
+
+
+def init_db(app):
+    if app.config['DB_AUTO_MIGRATE']:
+        run_migrations(app.config)
+    db_executor.configure(app.config['DB_THREADPOOL_SIZE'])
+    app.extensions['db_pools'] = {
+        'api': _make_pool(app, 'api', app.config['DATABASE_PATH']),
+        'api2': _make_pool(app, 'api2', app.config['DATABASE2_PATH']),
+        # both files on one connection, for queries spanning movies and series
+        'catalog': _make_pool(app, 'catalog', app.config['DATABASE_PATH'],
+                              attached={SERIES_SCHEMA: app.config['DATABASE2_PATH']}),
+    }
+    app.teardown_appcontext(release_db)
+
+
+def get_pool(name):
+    return current_app.extensions['db_pools'][name]
+
+
+def _get_db(name):
+    conns = g.setdefault('_db_conns', {})
+    if name not in conns:
+        conns[name] = get_pool(name).acquire()
+    return conns[name]
+
+
+def get_db_api():
+    return _get_db('api')
+
+def get_db_api2():
+    return _get_db('api2')
+
+def get_db_catalog():
+    """Connection to DATABASE_PATH with DATABASE2_PATH attached as ``SERIES_SCHEMA``.
+
+    Unqualified names resolve across both files (``movies`` from the main
+    database, ``tv_series``/``episodes`` from the attached one). Use it for
+    reads; a write touching both files is not atomic across them in WAL mode.
+    """
+    return _get_db('catalog')
+
+
+def detach_db(conn):
+    """Take ``conn`` out of the app context so teardown does not release it.
+
+    Used by streamed responses, which keep reading after the view returns;
+    the caller must hand the connection back with the returned pool.
+    """
+    conns = g.get('_db_conns', {})
+    for name, held in list(conns.items()):
+        if held is conn:
+            del conns[name]
+            return get_pool(name)
+    return None
+
+
+def release_db(exc=None):
+    conns = g.pop('_db_conns', None)
+    if not conns:
+        return
+    for name, conn in conns.items():
+        get_pool(name).release(conn)
+
+
+def pool_stats():
+    return {name: pool.stats() for name, pool in current_app.extensions['db_pools'].items()}
+
+
+def executor_stats():
+    return db_executor.stats()
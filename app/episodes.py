@@ -0,0 +1,100 @@
+from flask import request, jsonify
+from app.pagination import encode_cursor, decode_cursor, InvalidCursor
+from app.utils.helpers import row_layout, dumps_json, json_bytes_response, stream_rows
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Served from idx_episodes_series (series_id, season, episode_number); the
+# rowid stored in each index entry breaks ties, so no sort step is needed.
+ORDER = 'season, episode_number, id'
+KEY_COLUMNS = ('season', 'episode_number', 'id')
+CURSOR_SORT = 'episode'
+
+
+def _filters(series_id, season):
+    where = 'series_id = ?'
+    params = [series_id]
+    if season is not None:
+        where += ' AND season = ?'
+        params.append(season)
+    return where, params
+
+
+def episode_page(conn, series_id, season=None, after=None, page_size=PAGE_SIZE):
+    """Fetch one page of a series' episodes in season order, after the keyset ``after``.
+
+    Returns ``(cursor, rows, next_key)`` like ``keyset_page``.
+    """
+    where, params = _filters(series_id, season)
+    if after is not None:
+        where += f' AND ({", ".join(KEY_COLUMNS)}) > (?, ?, ?)'
+        params.extend(after)
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT * FROM episodes WHERE {where} ORDER BY {ORDER} LIMIT ?', (*params, page_size + 1))
+    rows = cursor.fetchall()
+
+    next_key = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        columns = [col[0] for col in cursor.description]
+        next_key = [rows[-1][columns.index(name)] for name in KEY_COLUMNS]
+    return cursor, rows, next_key
+
+
+def episodes_by_series(conn, series_ids):
+    """Episodes of several series from one query: ``{series_id: [episode, ...]}`` in season order."""
+    if not series_ids:
+        return {}
+    cursor = conn.cursor()
+    cursor.execute(
+        f'SELECT * FROM episodes WHERE series_id IN ({", ".join("?" for _ in series_ids)}) ORDER BY series_id, {ORDER}',
+        list(series_ids),
+    )
+    layout = row_layout(cursor)
+    grouped = {}
+    # fetchall() goes through the thread pool; iterating the cursor would step it on the hub
+    for row in cursor.fetchall():
+        episode = layout.to_dict(row)
+        grouped.setdefault(episode['series_id'], []).append(episode)
+    return grouped
+
+
+def season_summary(conn, series_id):
+    """Episode count per season, read from the index alone."""
+    cursor = conn.execute(
+        'SELECT season, COUNT(*) AS episodes FROM episodes WHERE series_id = ? GROUP BY season ORDER BY season',
+        (series_id,),
+    )
+    return cursor
+
+
+def episodes_response(conn, series_id, season=None):
+    """Serve a series' episodes in season order.
+
+    Without ``cursor`` the whole (filtered) list is returned, streamed when
+    large. With ``cursor`` (empty for the first page) one page of ``limit``
+    episodes is returned in an ``{"items": [...], "next_cursor": ...}``
+    envelope, with the next token also in ``X-Next-Cursor``.
+    """
+    token = request.args.get('cursor')
+    if token is None:
+        where, params = _filters(series_id, season)
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT * FROM episodes WHERE {where} ORDER BY {ORDER}', params)
+        return stream_rows(cursor)
+
+    try:
+        after = decode_cursor(token, CURSOR_SORT, KEY_COLUMNS) if token else None
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+    cursor, rows, next_key = episode_page(conn, series_id, season, after, limit)
+    next_cursor = encode_cursor(CURSOR_SORT, next_key) if next_key else None
+    response = json_bytes_response(
+        b'{"items":' + row_layout(cursor).encode_rows(rows) + b',"next_cursor":' + dumps_json(next_cursor) + b'}'
+    )
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
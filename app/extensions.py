@@ -1,6 +1,21 @@
+import hashlib
+import logging
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import request, current_app, Response
 from flask_socketio import SocketIO
 from flask_caching import Cache
 from flasgger import Swagger
+from app.signals import movie_added, series_added, episode_added, views_flushed, bulk_written
+from app.utils.helpers import wants_ndjson
+from app.compression import compress_variants, encoded_response, ETAG_SUFFIXES
+
+logger = logging.getLogger(__name__)
 
 socketio = SocketIO(cors_allowed_origins="*")
 cache = Cache()
@@ -14,3 +29,433 @@ swagger = Swagger(template={
     "basePath": "/",
     "schemes": ["http", "https"]
 })
+
+
+REDIS_CACHE_TYPES = ('RedisCache', 'app.cache_backend.TwoTierCache')
+
+
+def redis_client(app):
+    """Redis connection for subsystems that share the cache's Redis, or None."""
+    if app.config.get('CACHE_TYPE') not in REDIS_CACHE_TYPES:
+        return None
+    import redis
+    from redis.backoff import NoBackoff
+    from redis.retry import Retry
+    return redis.Redis(
+        host=app.config['CACHE_REDIS_HOST'],
+        port=app.config['CACHE_REDIS_PORT'],
+        db=app.config['CACHE_REDIS_DB'],
+        socket_timeout=1,
+        retry=Retry(NoBackoff(), 0),
+    )
+
+
+# Cache generations: every cached view key embeds the current token of the
+# generations it depends on, so a write only has to bump a token to make all
+# dependent entries unreachable; they then age out on their own TTL.
+GENERATION_PREFIX = 'gen:'
+
+
+def cache_generation(name):
+    key = GENERATION_PREFIX + name
+    value = cache.get(key)
+    if value is None:
+        value = time.time_ns()
+        if not cache.add(key, value, timeout=0):
+            value = cache.get(key) or value
+    return value
+
+
+def bump_generation(name):
+    try:
+        cache.set(GENERATION_PREFIX + name, time.time_ns(), timeout=0)
+    except Exception:
+        logger.exception("Could not bump cache generation %s", name)
+
+
+def normalize_text(values):
+    """Case- and whitespace-insensitive free text (search queries)."""
+    return [' '.join(value.lower().split()) for value in values]
+
+
+def normalize_list(values):
+    """Comma separated and/or repeated values, order-insensitive (genres)."""
+    items = {' '.join(part.lower().split()) for value in values for part in value.split(',')}
+    return sorted(item for item in items if item)
+
+
+def _normalized_query(args, normalizers, ignored):
+    pairs = []
+    for name in sorted(args):
+        if name in ignored:
+            continue
+        values = args.getlist(name)
+        if name in normalizers:
+            values = normalizers[name](values)
+        else:
+            values = sorted(value.strip() for value in values)
+        pairs.extend((name, value) for value in values)
+    return urlencode(pairs)
+
+
+class CachePolicy:
+    def __init__(self, name, timeout, max_entries=None, negative_timeout=None):
+        self.name = name
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.negative_timeout = timeout if negative_timeout is None else negative_timeout
+
+
+class CachePolicies:
+    """Per-endpoint view caching: normalized keys, TTLs, entry caps, negative caching, stats.
+
+    Policies come from ``CACHE_POLICIES`` keyed by the name given to
+    ``cached_view``. Entry caps are enforced per process by evicting the
+    oldest keys this worker stored for the endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._policies = {}
+        self._keys = {}
+        self._stats = {}
+        self.ignored_args = frozenset()
+
+    def init_app(self, app):
+        self.ignored_args = frozenset(app.config['CACHE_IGNORED_ARGS'])
+        default_timeout = app.config['CACHE_DEFAULT_TIMEOUT']
+        for name, options in app.config['CACHE_POLICIES'].items():
+            self._policies[name] = CachePolicy(name, options.get('timeout', default_timeout),
+                                               options.get('max_entries'), options.get('negative_timeout'))
+
+    def policy(self, name):
+        policy = self._policies.get(name)
+        if policy is None:
+            policy = self._policies[name] = CachePolicy(name, current_app.config['CACHE_DEFAULT_TIMEOUT'])
+        return policy
+
+    def count(self, name, field):
+        with self._lock:
+            stats = self._stats.setdefault(name, {"hits": 0, "negative_hits": 0, "stale_hits": 0, "misses": 0,
+                                                  "early_refreshes": 0, "coalesced": 0, "stores": 0,
+                                                  "evictions": 0, "errors": 0, "not_modified": 0})
+            stats[field] += 1
+
+    def track(self, policy, key):
+        if not policy.max_entries:
+            return []
+        with self._lock:
+            keys = self._keys.setdefault(policy.name, OrderedDict())
+            keys[key] = None
+            keys.move_to_end(key)
+            evicted = []
+            while len(keys) > policy.max_entries:
+                evicted.append(keys.popitem(last=False)[0])
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for name, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                result[name] = dict(stats, hit_ratio=round(stats["hits"] / lookups, 4) if lookups else None,
+                                    tracked_entries=len(self._keys.get(name, ())))
+            return result
+
+
+cache_policies = CachePolicies()
+
+_EMPTY_BODIES = (b'[]', b'[]\n')
+
+# lookup() reads the cache itself unless the caller already did
+_UNREAD = object()
+
+
+class SingleFlight:
+    """Per-process registry of keys being rebuilt, so concurrent misses wait for one caller."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def claim(self, key):
+        """Return ``(leader, event)``; only the leader rebuilds, the others wait on ``event``."""
+        with self._lock:
+            event = self._flights.get(key)
+            if event is not None:
+                return False, event
+            event = self._flights[key] = threading.Event()
+            return True, event
+
+    def done(self, key):
+        with self._lock:
+            event = self._flights.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+_flights = SingleFlight()
+
+
+def _expiring(entry, beta):
+    """XFetch: refresh early with a probability that grows as expiry nears.
+
+    ``delta`` is how long the entry took to compute, so expensive entries are
+    refreshed earlier and the rebuilds of one key spread out instead of lining
+    up on the TTL boundary.
+    """
+    expires_at, delta = entry[4], entry[5]
+    return time.time() - delta * beta * math.log(1.0 - random.random()) >= expires_at
+
+
+def _wait_for_entry(key, wait):
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _validators(key, tokens):
+    """``(etag, last_modified)`` for a view key, or None when no generation applies.
+
+    Generation tokens are the ``time_ns`` of the last bump, so they double as
+    modification times. Last-Modified is the second after the newest token and
+    is only sent once that second has passed, so a second bump within the same
+    second can never be hidden behind an ``If-Modified-Since`` match. Like the
+    cache itself, the version ignores view counts that have not bumped a
+    ``:views`` generation.
+    """
+    if not tokens:
+        return None
+    etag = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+    modified = max(tokens) // 1_000_000_000 + 1
+    return etag, modified if modified <= time.time() else None
+
+
+def _not_modified(etag, modified):
+    """The ETag the client's copy matches (any content coding of it), or None."""
+    if request.if_none_match:
+        for tag in (etag, *(etag + suffix for suffix in ETAG_SUFFIXES.values())):
+            if request.if_none_match.contains_weak(tag):
+                return tag
+        return None
+    since = request.if_modified_since
+    if modified is not None and since is not None and modified <= since.timestamp():
+        return etag
+    return None
+
+
+def _with_validators(response, validators, etag=None):
+    if validators is not None and response.status_code in (200, 304):
+        base, modified = validators
+        if etag is None:
+            etag = base + ETAG_SUFFIXES.get(response.headers.get('Content-Encoding'), '')
+        response.set_etag(etag)
+        if modified is not None:
+            response.last_modified = modified
+        # let clients keep the body but revalidate before reusing it
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_view(name, generations=(), normalizers=None, on_hit=None, conditional=True):
+    """Cache a view's 200 responses under the ``name`` policy.
+
+    The key is built from the endpoint name, the normalized query args and the
+    current tokens of ``generations`` (names, or callables returning a name or
+    None). Empty-array results are stored with the policy's negative TTL.
+    ``on_hit`` runs for non-empty cache hits, for side effects the view would
+    otherwise have performed. Streamed responses are never cached.
+
+    Only one caller rebuilds a missing or early-expiring key: other requests in
+    the process wait for it, other workers (through a short ``lock:`` key) serve
+    the stale entry or wait briefly, and compute themselves if nothing arrives.
+
+    With ``conditional``, responses carry a strong ETag and Last-Modified
+    derived from the same generation tokens, and matching ``If-None-Match`` /
+    ``If-Modified-Since`` requests get a 304 when the key holds a cached
+    non-empty 200 (``on_hit`` still runs); otherwise the view runs, so invalid
+    input still gets its error.
+
+    Entries also hold gzip (and brotli, when installed) copies of the body,
+    made once when the entry is stored; each hit is sent in the coding the
+    client's Accept-Encoding prefers, with the coding appended to the ETag.
+    """
+    normalizers = normalizers or {}
+
+    def serve(entry, stale=False):
+        body, mimetype, headers, negative = entry[:4]
+        cache_policies.count(name, "hits")
+        if stale:
+            cache_policies.count(name, "stale_hits")
+        if negative:
+            cache_policies.count(name, "negative_hits")
+        elif on_hit is not None:
+            on_hit()
+        return encoded_response(body, mimetype, headers, entry[6] if len(entry) > 6 else None)
+
+    def decorator(f):
+        def compute(policy, key, args, kwargs):
+            started = time.time()
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+
+            body = response.get_data()
+            negative = body in _EMPTY_BODIES
+            timeout = policy.negative_timeout if negative else policy.timeout
+            if not timeout:
+                return response
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ('content-type', 'content-length')]
+            # compressed once here, then served to every client that accepts them
+            variants = compress_variants(body)
+            now = time.time()
+            try:
+                cache.set(key, (body, response.mimetype, headers, negative, now + timeout, now - started, variants),
+                          timeout=timeout)
+                cache_policies.count(name, "stores")
+                for evicted in cache_policies.track(policy, key):
+                    cache.delete(evicted)
+                    cache_policies.count(name, "evictions")
+            except Exception:
+                logger.exception("Cache store failed for %s", name)
+                cache_policies.count(name, "errors")
+            return encoded_response(body, response.mimetype, headers, variants)
+
+        def lookup(policy, key, args, kwargs, entry=_UNREAD):
+            config = current_app.config
+            if entry is _UNREAD:
+                try:
+                    entry = cache.get(key)
+                except Exception:
+                    logger.exception("Cache lookup failed for %s", name)
+                    cache_policies.count(name, "errors")
+                    return f(*args, **kwargs)
+
+            if entry is not None and len(entry) < 6:
+                # stored by an older release, rebuild it in the current format
+                entry = None
+            if entry is not None:
+                if not _expiring(entry, config['CACHE_EARLY_REFRESH_BETA']):
+                    return serve(entry)
+                cache_policies.count(name, "early_refreshes")
+
+            leader, event = _flights.claim(key)
+            if not leader:
+                if entry is not None:
+                    return serve(entry, stale=True)
+                cache_policies.count(name, "coalesced")
+                event.wait(config['CACHE_LOCK_WAIT'])
+                fresh = cache.get(key)
+                if fresh is not None:
+                    return serve(fresh)
+                cache_policies.count(name, "misses")
+                return compute(policy, key, args, kwargs)
+
+            lock_key = 'lock:' + key
+            locked = False
+            try:
+                try:
+                    locked = cache.add(lock_key, 1, timeout=config['CACHE_LOCK_TIMEOUT'])
+                except Exception:
+                    locked = True
+                if not locked:
+                    # another worker is rebuilding this key
+                    if entry is not None:
+                        return serve(entry, stale=True)
+                    cache_policies.count(name, "coalesced")
+                    fresh = _wait_for_entry(key, config['CACHE_LOCK_WAIT'])
+                    if fresh is not None:
+                        return serve(fresh)
+                cache_policies.count(name, "misses")
+                return compute(policy, key, args, kwargs)
+            finally:
+                _flights.done(key)
+                if locked:
+                    try:
+                        cache.delete(lock_key)
+                    except Exception:
+                        pass
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            policy = cache_policies.policy(name)
+            if not (policy.timeout or conditional) or wants_ndjson():
+                return f(*args, **kwargs)
+            try:
+                scopes = [scope() if callable(scope) else scope for scope in generations]
+                tokens = [cache_generation(scope) for scope in scopes if scope]
+                key = f'view:{name}:{_normalized_query(request.args, normalizers, cache_policies.ignored_args)}#{".".join(map(str, tokens))}'
+            except Exception:
+                logger.exception("Cache lookup failed for %s", name)
+                cache_policies.count(name, "errors")
+                return f(*args, **kwargs)
+
+            validators = _validators(key, tokens) if conditional else None
+            matched = _not_modified(*validators) if validators is not None else None
+            entry = _UNREAD
+            if matched is not None and policy.timeout:
+                # only a key already answered with a cached non-empty 200 can be
+                # unchanged: anything else (invalid input, missing rows) goes
+                # through the view so it gets its own error or empty result
+                try:
+                    entry = cache.get(key)
+                except Exception:
+                    logger.exception("Cache lookup failed for %s", name)
+                    entry = None
+                if entry is not None and len(entry) >= 6 and not entry[3]:
+                    cache_policies.count(name, "not_modified")
+                    if on_hit is not None:
+                        on_hit()
+                    response = Response(status=304)
+                    response.vary.add('Accept-Encoding')
+                    return _with_validators(response, validators, matched)
+
+            if not policy.timeout:
+                response = current_app.make_response(f(*args, **kwargs))
+            else:
+                response = lookup(policy, key, args, kwargs, entry)
+            return _with_validators(current_app.make_response(response), validators)
+        return decorated_function
+    return decorator
+
+
+def sorted_by_views(table):
+    """Scope for listings whose order also depends on flushed view counts."""
+    return lambda: f'{table}:views' if request.args.get('sort') == 'views' else None
+
+
+def _on_movie_changed(sender, item, **kwargs):
+    bump_generation('movies')
+
+
+def _on_series_changed(sender, item, **kwargs):
+    bump_generation('series')
+
+
+def _on_episode_changed(sender, item, **kwargs):
+    bump_generation(f"episodes:{item['series_id']}")
+
+
+def _on_bulk_written(sender, table, inserted, updated, **kwargs):
+    if table == 'episodes':
+        for series_id in {item['series_id'] for item in inserted + updated}:
+            bump_generation(f'episodes:{series_id}')
+    else:
+        bump_generation('movies' if table == 'movies' else 'series')
+
+
+def _on_views_flushed(sender, deltas, **kwargs):
+    for table in deltas:
+        bump_generation(f'{table}:views')
+
+
+def init_cache_invalidation():
+    movie_added.connect(_on_movie_changed)
+    series_added.connect(_on_series_changed)
+    episode_added.connect(_on_episode_changed)
+    bulk_written.connect(_on_bulk_written)
+    views_flushed.connect(_on_views_flushed)
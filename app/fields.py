@@ -0,0 +1,50 @@
+from flask import request
+
+# columns a client may select with fields=, per table
+FIELDS = {
+    'movies': ('id', 'title_eng', 'imdb', 'year', 'genres', 'poster', 'description', 'views'),
+    'tv_series': ('id', 'title_eng', 'imdb', 'year', 'genres', 'poster', 'description', 'views'),
+}
+
+# default projection of list endpoints: what a grid card shows
+CARD_FIELDS = ('id', 'title_eng', 'imdb', 'year', 'poster')
+
+ALL_FIELDS = 'all'
+
+
+def requested_fields(table, required=()):
+    """Columns a list endpoint should select: ``(columns, error)``.
+
+    ``fields=`` takes comma separated and/or repeated column names from
+    ``FIELDS``, or ``all`` for every column; without it the compact card is
+    used. Columns come back in table order, always with ``id`` and any
+    ``required`` ones (e.g. the keyset columns of the current sort).
+    """
+    allowed = FIELDS[table]
+    names = {part.strip().lower() for value in request.args.getlist('fields') for part in value.split(',')}
+    names.discard('')
+    if not names:
+        names = set(CARD_FIELDS)
+    elif ALL_FIELDS in names:
+        if len(names) > 1:
+            return None, f"fields={ALL_FIELDS} cannot be combined with other fields"
+        names = set(allowed)
+    unknown = sorted(names - set(allowed))
+    if unknown:
+        return None, f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)} or {ALL_FIELDS}"
+    names.update(('id', *required))
+    return tuple(name for name in allowed if name in names), None
+
+
+def select_list(columns, alias=None):
+    if columns is None:
+        return f'{alias}.*' if alias else '*'
+    prefix = f'{alias}.' if alias else ''
+    return ', '.join(prefix + name for name in columns)
+
+
+FIELDS_PARAMETER = {
+    'name': 'fields', 'in': 'query', 'type': 'string', 'required': False,
+    'description': 'Comma separated columns to return (id, title_eng, imdb, year, genres, poster, description, views) '
+                   'or "all". Default: the compact card (id, title_eng, imdb, year, poster)',
+}
@@ -0,0 +1,97 @@
+import re
+from app.fields import select_list
+
+# catalog table -> (join table, foreign key column)
+GENRE_TABLES = {
+    'movies': ('movie_genres', 'movie_id'),
+    'tv_series': ('series_genres', 'series_id'),
+}
+
+MAX_GENRES_PER_QUERY = 10
+# rows read per fetchmany() while backfilling a join table
+BACKFILL_BATCH = 1000
+
+_SPLIT_RE = re.compile(r'[,|/;]')
+
+
+def parse_genres(text):
+    """Split the free-text ``genres`` column into unique, trimmed genre names."""
+    seen = set()
+    genres = []
+    for part in _SPLIT_RE.split(text or ''):
+        name = ' '.join(part.split())
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            genres.append(name)
+    return genres
+
+
+def genre_table_steps(table):
+    join_table, fk = GENRE_TABLES[table]
+    return [
+        f'''
+        CREATE TABLE IF NOT EXISTS {join_table} (
+            genre TEXT NOT NULL COLLATE NOCASE,
+            {fk} INTEGER NOT NULL,
+            PRIMARY KEY (genre, {fk})
+        ) WITHOUT ROWID
+        ''',
+        f'CREATE INDEX IF NOT EXISTS idx_{join_table}_{fk} ON {join_table}({fk})',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {join_table}_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM {join_table} WHERE {fk} = old.id;
+        END
+        ''',
+        lambda cursor: backfill_genres(cursor, table),
+    ]
+
+
+def _batched_rows(cursor):
+    # fetchmany() rather than iterating, so offloaded cursors read in the thread pool
+    while True:
+        rows = cursor.fetchmany(BACKFILL_BATCH)
+        if not rows:
+            return
+        yield from rows
+
+
+def backfill_genres(cursor, table):
+    join_table, fk = GENRE_TABLES[table]
+    # read through a second cursor so the whole table is never held in memory
+    rows = _batched_rows(cursor.connection.execute(f'SELECT id, genres FROM {table}'))
+    cursor.executemany(
+        f'INSERT OR IGNORE INTO {join_table} (genre, {fk}) VALUES (?, ?)',
+        ((genre, item_id) for item_id, text in rows for genre in parse_genres(text)),
+    )
+
+
+def sync_genres(cursor, table, item_id, text):
+    join_table, fk = GENRE_TABLES[table]
+    cursor.execute(f'DELETE FROM {join_table} WHERE {fk} = ?', (item_id,))
+    cursor.executemany(
+        f'INSERT OR IGNORE INTO {join_table} (genre, {fk}) VALUES (?, ?)',
+        ((genre, item_id) for genre in parse_genres(text)),
+    )
+
+
+def requested_genres(args):
+    """Collect genres from repeated ``genre=`` args and/or comma separated values."""
+    genres = []
+    for value in args.getlist('genre'):
+        genres.extend(parse_genres(value))
+    return parse_genres(','.join(genres))
+
+
+def find_by_genres(conn, table, genres, match='any', columns=None):
+    join_table, fk = GENRE_TABLES[table]
+    placeholders = ', '.join('?' for _ in genres)
+    if match == 'all' and len(genres) > 1:
+        ids_sql = f'''
+            SELECT {fk} FROM {join_table} WHERE genre IN ({placeholders})
+            GROUP BY {fk} HAVING COUNT(*) = {len(genres)}
+        '''
+    else:
+        ids_sql = f'SELECT {fk} FROM {join_table} WHERE genre IN ({placeholders})'
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT {select_list(columns)} FROM {table} WHERE id IN ({ids_sql}) ORDER BY id', genres)
+    return cursor
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+import threading
+import time
+from app.db import TABLE_POOLS
+from app.extensions import cache_generation
+from app.fields import CARD_FIELDS
+from app.compression import compress_variants
+from app.leaderboards import leaderboards
+from app.signals import movie_added, series_added, bulk_written, views_flushed
+from app.utils.helpers import row_layout, dumps_json
+
+logger = logging.getLogger(__name__)
+
+# section -> (leaderboard, table); each holds LEADERBOARD_SIZE cards
+SECTIONS = {
+    'movies_latest': ('latest', 'movies'),
+    'movies_most_viewed': ('most_viewed', 'movies'),
+    'series_latest': ('latest', 'tv_series'),
+    'series_most_viewed': ('most_viewed', 'tv_series'),
+}
+
+# cache generations the sections depend on; bumped by uploads and view flushes on any worker
+GENERATIONS = ('movies', 'series', 'movies:views', 'tv_series:views')
+
+
+class HomeFeed:
+    """The landing page sections, held as one ready-to-send body.
+
+    The body is built off the request path: the catalog signals of this
+    worker mark it dirty, and every ``HOME_FEED_CHECK_INTERVAL`` seconds the
+    generation tokens are compared so changes made on other workers are picked
+    up too. A rebuild waits ``HOME_FEED_REFRESH_DELAY`` seconds first so a
+    burst of uploads or a view flush costs one build. The finished ``(body, etag, variants, tokens)``
+    tuple replaces the previous one in a single assignment, so requests
+    always see a complete feed.
+    """
+
+    def __init__(self):
+        self._app = None
+        self._feed = None
+        self._build_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"builds": 0, "errors": 0, "last_build": None, "last_build_ms": None, "bytes": 0}
+
+    def init_app(self, app):
+        self._app = app
+        app.extensions['home_feed'] = self
+        for signal in (movie_added, series_added, bulk_written, views_flushed):
+            signal.connect(self._on_change, weak=False)
+        interval = app.config['HOME_FEED_CHECK_INTERVAL']
+        if interval > 0 and self._thread is None:
+            self._dirty.set()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval, app.config['HOME_FEED_REFRESH_DELAY']), name='home-feed', daemon=True
+            )
+            self._thread.start()
+
+    def _on_change(self, sender, **kwargs):
+        self._dirty.set()
+
+    def _run(self, interval, delay):
+        while not self._stop.is_set():
+            changed = self._dirty.wait(interval)
+            if changed:
+                # let the rest of a burst land in the same build
+                if self._stop.wait(delay):
+                    break
+                self._dirty.clear()
+            try:
+                with self._app.app_context():
+                    if changed or self._stale(self._feed):
+                        self.refresh()
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+                logger.exception("Home feed refresh failed")
+
+    def _tokens(self):
+        return tuple(cache_generation(name) for name in GENERATIONS)
+
+    def _stale(self, feed):
+        return feed is None or feed[3] != self._tokens()
+
+    def current(self):
+        """The feed to serve, built now only on a cold start (or when no refresher runs and it went stale)."""
+        feed = self._feed
+        if feed is None or (self._thread is None and self._stale(feed)):
+            with self._build_lock:
+                feed = self._feed
+                if self._stale(feed):
+                    feed = self._build()
+        return feed
+
+    def refresh(self):
+        """Rebuild the feed from the leaderboards and swap it in; returns it."""
+        with self._build_lock:
+            return self._build()
+
+    def _build(self):
+        started = time.perf_counter()
+        # read before building: a bump during the build makes the result stale, not lost
+        tokens = self._tokens()
+        pools = self._app.extensions['db_pools']
+        sections = {}
+        for name, (board, table) in SECTIONS.items():
+            with pools[TABLE_POOLS[table]].connection() as conn:
+                cursor, rows = leaderboards.rows(conn, board, table, columns=CARD_FIELDS)
+                layout = row_layout(cursor)
+                sections[name] = [layout.to_dict(row) for row in rows]
+        body = dumps_json(sections) + b'\n'
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        feed = (body, etag, compress_variants(body), tokens)
+        self._feed = feed
+
+        with self._lock:
+            self._stats["builds"] += 1
+            self._stats["last_build"] = time.time()
+            self._stats["last_build_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._stats["bytes"] = len(body)
+        return feed
+
+    def stop(self):
+        self._stop.set()
+        self._dirty.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        feed = self._feed
+        stats["etag"] = feed[1] if feed else None
+        stats["variants"] = sorted(feed[2]) if feed else []
+        return stats
+
+
+home_feed = HomeFeed()
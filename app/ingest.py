@@ -0,0 +1,313 @@
+import codecs
+import json
+import sqlite3
+from app.genres import sync_genres
+from app.signals import bulk_written
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+READ_SIZE = 64 * 1024
+
+
+class BulkFormatError(ValueError):
+    pass
+
+
+class IngestSpec:
+    """How one catalog table is validated and upserted by the bulk endpoints."""
+
+    def __init__(self, table, columns, required, key, integers=(), parent=None, genres=False, defaults=None):
+        self.table = table
+        self.columns = columns
+        self.required = required
+        self.key = key
+        self.integers = integers
+        self.parent = parent
+        self.genres = genres
+        self.defaults = defaults or {}
+        self.key_index = [columns.index(name) for name in key]
+        self.value_columns = [name for name in columns if name not in key]
+
+
+SPECS = {
+    'movies': IngestSpec(
+        'movies',
+        columns=('title_eng', 'imdb', 'year', 'genres', 'poster', 'description'),
+        required=('title_eng', 'imdb', 'year', 'genres', 'poster'),
+        key=('imdb',),
+        integers=('year',),
+        genres=True,
+        defaults={'views': 0},
+    ),
+    'tv_series': IngestSpec(
+        'tv_series',
+        columns=('title_eng', 'imdb', 'year', 'genres', 'poster', 'description'),
+        required=('title_eng', 'imdb', 'year', 'genres', 'poster'),
+        key=('imdb',),
+        integers=('year',),
+        genres=True,
+        defaults={'views': 0},
+    ),
+    'episodes': IngestSpec(
+        'episodes',
+        columns=('series_id', 'title_eng', 'season', 'episode_number', 'video_link'),
+        required=('series_id', 'title_eng', 'season', 'episode_number', 'video_link'),
+        key=('series_id', 'season', 'episode_number'),
+        integers=('series_id', 'season', 'episode_number'),
+        parent=('tv_series', 'series_id'),
+    ),
+}
+
+
+# request body parsing
+
+def iter_ndjson(stream, max_row_bytes):
+    """Yield ``(row, error)`` for each non-blank line of an NDJSON body."""
+    while True:
+        line = stream.readline(max_row_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_row_bytes and not line.endswith(b'\n'):
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(READ_SIZE)
+            yield None, f'row is larger than {max_row_bytes} bytes'
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line), None
+        except ValueError as e:
+            yield None, f'invalid JSON: {e}'
+
+
+class JSONArrayReader:
+    """Decode the elements of a top-level JSON array one at a time from a byte stream."""
+
+    def __init__(self, stream, max_row_bytes):
+        self.stream = stream
+        self.max_row_bytes = max_row_bytes
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.stream.read(READ_SIZE)
+        if not data:
+            self.eof = True
+        try:
+            text = self.utf8.decode(data, final=self.eof)
+        except UnicodeDecodeError:
+            raise BulkFormatError('Body is not valid UTF-8')
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+
+    def _peek(self):
+        """Skip whitespace and return the next character ('' at the end of the body)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError as e:
+                if self.eof:
+                    raise BulkFormatError(f'Invalid JSON: {e}')
+                if len(self.buf) - self.pos > self.max_row_bytes:
+                    raise BulkFormatError(f'Row is larger than {self.max_row_bytes} bytes')
+                self._fill()
+                continue
+            if end == len(self.buf) and not self.eof:
+                # a bare number could continue in the next read
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def __iter__(self):
+        if self._peek() != '[':
+            raise BulkFormatError('Body must be a JSON array or NDJSON')
+        self.pos += 1
+        if self._peek() == ']':
+            return
+        while True:
+            yield self._value(), None
+            char = self._peek()
+            if char == ']':
+                return
+            if char != ',':
+                raise BulkFormatError('Invalid JSON: expected "," or "]" between rows')
+            self.pos += 1
+
+
+def iter_rows(stream, mimetype, max_row_bytes):
+    if mimetype == NDJSON_MIMETYPE:
+        return iter_ndjson(stream, max_row_bytes)
+    return iter(JSONArrayReader(stream, max_row_bytes))
+
+
+# validation and writes
+
+def validate(spec, row):
+    """Return ``(values, error)`` for one decoded row."""
+    if not isinstance(row, dict):
+        return None, 'row must be a JSON object'
+    missing = [name for name in spec.required if row.get(name) in (None, '')]
+    if missing:
+        return None, f'missing fields: {", ".join(missing)}'
+    for name in spec.columns:
+        value = row.get(name)
+        if value is None:
+            continue
+        if name in spec.integers:
+            if type(value) is not int:
+                return None, f'{name} must be an integer'
+        elif not isinstance(value, str):
+            return None, f'{name} must be a string'
+    return tuple(row.get(name) for name in spec.columns), None
+
+
+def _key(spec, values):
+    return tuple(values[i] for i in spec.key_index)
+
+
+def _lookup(cursor, spec, keys):
+    """Map natural keys to the (lowest) existing id, using the key's index."""
+    if not keys:
+        return {}
+    columns = ', '.join(spec.key)
+    placeholders = ', '.join('(' + ', '.join('?' for _ in spec.key) + ')' for _ in keys)
+    join = ' AND '.join(f't.{name} = k.{name}' for name in spec.key)
+    cursor.execute(
+        f'WITH k({columns}) AS (VALUES {placeholders}) '
+        f'SELECT {", ".join("k." + name for name in spec.key)}, MIN(t.id) FROM k JOIN {spec.table} t ON {join} '
+        f'GROUP BY {", ".join("k." + name for name in spec.key)}',
+        [value for key in keys for value in key],
+    )
+    return {tuple(row[:-1]): row[-1] for row in cursor.fetchall()}
+
+
+def _existing_parents(cursor, spec, chunk):
+    table, column = spec.parent
+    ids = sorted({values[spec.columns.index(column)] for _, values in chunk})
+    cursor.execute(f'SELECT id FROM {table} WHERE id IN ({", ".join("?" for _ in ids)})', ids)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def write_chunk(conn, spec, chunk):
+    """Upsert one chunk of validated ``(index, values)`` rows in a single transaction.
+
+    Returns ``(results, written)``; ``written`` maps ``inserted`` / ``updated``
+    to the committed items, announced once per chunk by ``ingest``.
+    """
+    results = []
+    latest = {}
+    for index, values in chunk:
+        key = _key(spec, values)
+        if key in latest:
+            results.append({"index": latest[key][0], "status": "skipped",
+                            "error": f'superseded by row {index} with the same key'})
+        latest[key] = (index, values)
+    rows = list(latest.values())
+
+    cursor = conn.cursor()
+    written = {"inserted": [], "updated": []}
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        with conn:
+            if spec.parent is not None:
+                parents = _existing_parents(cursor, spec, rows)
+                parent_index = spec.columns.index(spec.parent[1])
+                for index, values in [row for row in rows if row[1][parent_index] not in parents]:
+                    results.append({"index": index, "status": "error", "error": f'{spec.parent[1]} {values[parent_index]} does not exist'})
+                rows = [row for row in rows if row[1][parent_index] in parents]
+
+            existing = _lookup(cursor, spec, [_key(spec, values) for _, values in rows])
+            inserts = [row for row in rows if _key(spec, row[1]) not in existing]
+            updates = [row for row in rows if _key(spec, row[1]) in existing]
+
+            cursor.executemany(
+                f'INSERT INTO {spec.table} ({", ".join(spec.columns)}) VALUES ({", ".join("?" for _ in spec.columns)})',
+                [values for _, values in inserts],
+            )
+            inserted = _lookup(cursor, spec, [_key(spec, values) for _, values in inserts])
+
+            assignments = ', '.join(
+                f'{name} = ?' if name in spec.required else f'{name} = COALESCE(?, {name})'
+                for name in spec.value_columns
+            )
+            value_index = [spec.columns.index(name) for name in spec.value_columns]
+            cursor.executemany(
+                f'UPDATE {spec.table} SET {assignments} WHERE id = ?',
+                [tuple(values[i] for i in value_index) + (existing[_key(spec, values)],) for _, values in updates],
+            )
+
+            for status, batch, ids in (('inserted', inserts, inserted), ('updated', updates, existing)):
+                for index, values in batch:
+                    item_id = ids[_key(spec, values)]
+                    item = dict(zip(spec.columns, values), id=item_id)
+                    if spec.genres:
+                        sync_genres(cursor, spec.table, item_id, item['genres'])
+                    if status == 'inserted':
+                        item.update(spec.defaults)
+                    results.append({"index": index, "status": status, "id": item_id})
+                    written[status].append(item)
+    except sqlite3.Error as e:
+        failed = {index for index, _ in rows}
+        results = [result for result in results if result["index"] not in failed]
+        results.extend({"index": index, "status": "error", "error": f'database error: {e}'} for index, _ in rows)
+        written = {"inserted": [], "updated": []}
+    return results, written
+
+
+def ingest(conn, spec, rows, chunk_rows, max_rows, sender):
+    """Validate and upsert ``(row, error)`` pairs, committing every ``chunk_rows`` rows.
+
+    Returns the per-row results ordered by row index. A malformed body raises
+    ``BulkFormatError`` carrying the results of the chunks already committed.
+    """
+    results = []
+    chunk = []
+
+    def flush():
+        chunk_results, written = write_chunk(conn, spec, chunk)
+        results.extend(chunk_results)
+        if written["inserted"] or written["updated"]:
+            # one notification per committed chunk, not per row
+            bulk_written.send(sender, table=spec.table, **written)
+        chunk.clear()
+
+    try:
+        for index, (row, error) in enumerate(rows):
+            if index >= max_rows:
+                raise BulkFormatError(f'At most {max_rows} rows are allowed per request')
+            values = None
+            if error is None:
+                values, error = validate(spec, row)
+            if error is not None:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+            chunk.append((index, values))
+            if len(chunk) >= chunk_rows:
+                flush()
+        if chunk:
+            flush()
+    except BulkFormatError as e:
+        results.sort(key=lambda result: result["index"])
+        e.results = results
+        raise
+    results.sort(key=lambda result: result["index"])
+    return results
+
+
+def summarize(results):
+    counts = {"inserted": 0, "updated": 0, "skipped": 0, "failed": 0}
+    for result in results:
+        counts["failed" if result["status"] == "error" else result["status"]] += 1
+    return dict(counts, results=results)
@@ -0,0 +1,310 @@
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+from app.db import TABLE_POOLS
+from app.extensions import redis_client
+from app.fields import select_list
+from app.signals import movie_added, series_added, bulk_written, views_flushed
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('movies', 'tv_series')
+
+# window name -> hours (None = all time)
+WINDOWS = {
+    'all': None,
+    '24h': 24,
+    '7d': 7 * 24,
+}
+MAX_WINDOW_HOURS = 7 * 24
+
+
+def _current_hour(now=None):
+    return int((now if now is not None else time.time()) // 3600)
+
+
+class MemoryStore:
+    """Per-process leaderboards: top-N score maps, latest ids and hourly view buckets."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._views = {table: {} for table in TABLES}
+        self._latest = {table: [] for table in TABLES}
+        self._hours = {table: {} for table in TABLES}
+        self._windows = {}
+
+    def load(self, table, top_views, latest_ids):
+        with self._lock:
+            self._views[table] = dict(top_views)
+            self._latest[table] = list(latest_ids)
+
+    def update_views(self, table, absolute):
+        with self._lock:
+            scores = self._views[table]
+            scores.update(absolute)
+            if len(scores) > self.size:
+                keep = heapq.nlargest(self.size, scores.items(), key=lambda item: (item[1], item[0]))
+                self._views[table] = dict(keep)
+
+    def add_new(self, table, scores):
+        """Rank ids not on the views board yet; they stay only if they make the top N."""
+        with self._lock:
+            board = self._views[table]
+            for item_id, views in scores.items():
+                board.setdefault(item_id, views)
+            if len(board) > self.size:
+                keep = heapq.nlargest(self.size, board.items(), key=lambda item: (item[1], item[0]))
+                self._views[table] = dict(keep)
+
+    def add_latest(self, table, item_ids):
+        with self._lock:
+            latest = self._latest[table]
+            latest.extend(item_id for item_id in set(item_ids) if item_id not in latest)
+            latest.sort(reverse=True)
+            del latest[self.size:]
+
+    def add_window_views(self, table, deltas, now=None):
+        hour = _current_hour(now)
+        with self._lock:
+            buckets = self._hours[table]
+            buckets.setdefault(hour, Counter()).update(deltas)
+            for old in [h for h in buckets if h <= hour - MAX_WINDOW_HOURS]:
+                del buckets[old]
+            for key in [k for k in self._windows if k[0] == table]:
+                del self._windows[key]
+
+    def most_viewed(self, table, hours=None):
+        with self._lock:
+            if hours is None:
+                scores = self._views[table]
+                return [item_id for item_id, _ in sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)]
+            now = _current_hour()
+            cached = self._windows.get((table, hours))
+            # a result also expires when the window slides past its oldest hour
+            if cached is not None and cached[0] == now:
+                return cached[1]
+            since = now - hours + 1
+            totals = Counter()
+            for hour, bucket in self._hours[table].items():
+                if hour >= since:
+                    totals.update(bucket)
+            ids = [item_id for item_id, _ in heapq.nlargest(self.size, totals.items(), key=lambda item: (item[1], item[0]))]
+            self._windows[(table, hours)] = (now, ids)
+            return ids
+
+    def latest(self, table):
+        with self._lock:
+            return list(self._latest[table])
+
+
+class RedisStore:
+    """Leaderboards as Redis sorted sets, shared by every worker."""
+
+    def __init__(self, client, size, prefix):
+        self.client = client
+        self.size = size
+        self.prefix = prefix
+
+    def _key(self, table, name):
+        return f'{self.prefix}{table}:{name}'
+
+    def load(self, table, top_views, latest_ids):
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(table, 'views'), self._key(table, 'latest'))
+        if top_views:
+            pipe.zadd(self._key(table, 'views'), dict(top_views))
+        if latest_ids:
+            pipe.zadd(self._key(table, 'latest'), {item_id: item_id for item_id in latest_ids})
+        pipe.execute()
+
+    def update_views(self, table, absolute):
+        key = self._key(table, 'views')
+        pipe = self.client.pipeline()
+        pipe.zadd(key, absolute)
+        pipe.zremrangebyrank(key, 0, -self.size - 1)
+        pipe.execute()
+
+    def add_new(self, table, scores):
+        key = self._key(table, 'views')
+        pipe = self.client.pipeline()
+        # NX: a flush that already ranked the id wins over its initial count
+        pipe.zadd(key, scores, nx=True)
+        pipe.zremrangebyrank(key, 0, -self.size - 1)
+        pipe.execute()
+
+    def add_latest(self, table, item_ids):
+        key = self._key(table, 'latest')
+        pipe = self.client.pipeline()
+        pipe.zadd(key, {item_id: item_id for item_id in item_ids})
+        pipe.zremrangebyrank(key, 0, -self.size - 1)
+        pipe.execute()
+
+    def add_window_views(self, table, deltas, now=None):
+        key = self._key(table, f'h:{_current_hour(now)}')
+        pipe = self.client.pipeline()
+        for item_id, count in deltas.items():
+            pipe.zincrby(key, count, item_id)
+        pipe.expire(key, (MAX_WINDOW_HOURS + 1) * 3600)
+        pipe.execute()
+
+    def most_viewed(self, table, hours=None):
+        if hours is None:
+            key = self._key(table, 'views')
+        else:
+            now = _current_hour()
+            key = self._key(table, f'w:{hours}:{now}')
+            if not self.client.exists(key):
+                sources = [self._key(table, f'h:{hour}') for hour in range(now - hours + 1, now + 1)]
+                pipe = self.client.pipeline()
+                pipe.zunionstore(key, sources)
+                pipe.zremrangebyrank(key, 0, -self.size - 1)
+                pipe.expire(key, 60)
+                pipe.execute()
+        return [int(item_id) for item_id in self.client.zrevrange(key, 0, self.size - 1)]
+
+    def latest(self, table):
+        return [int(item_id) for item_id in self.client.zrevrange(self._key(table, 'latest'), 0, self.size - 1)]
+
+
+class Leaderboards:
+    """Maintained most-viewed / latest rankings served without sorting the table.
+
+    Rankings are seeded from SQLite at startup, then updated incrementally from
+    the upload signals and from view-counter flushes. New rows are ranked with
+    their initial count, so they fill a views board that is below N; after
+    that, because ``views`` only grows, a row can only climb into the top-N
+    through a flush, at which point its absolute count is read back by
+    primary key.
+
+    Store failures are logged once per outage: until an update or read
+    succeeds again, further failures are only logged at debug level.
+    """
+
+    def __init__(self):
+        self.store = None
+        self._app = None
+        self._failing = False
+
+    def init_app(self, app):
+        self._app = app
+        size = app.config['LEADERBOARD_SIZE']
+        client = redis_client(app)
+        self.store = RedisStore(client, size, app.config['LEADERBOARD_KEY_PREFIX']) if client is not None else MemoryStore(size)
+        app.extensions['leaderboards'] = self
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Could not seed leaderboards, serving from SQL until the next update")
+
+        movie_added.connect(self._on_movie_added, weak=False)
+        series_added.connect(self._on_series_added, weak=False)
+        bulk_written.connect(self._on_bulk_written, weak=False)
+        views_flushed.connect(self._on_views_flushed, weak=False)
+
+    def _pool(self, table):
+        return self._app.extensions['db_pools'][TABLE_POOLS[table]]
+
+    def rebuild(self):
+        size = self.store.size
+        for table in TABLES:
+            with self._pool(table).connection() as conn:
+                top = conn.execute(f'SELECT id, views FROM {table} ORDER BY views DESC, id DESC LIMIT ?', (size,)).fetchall()
+                latest = [row[0] for row in conn.execute(f'SELECT id FROM {table} ORDER BY id DESC LIMIT ?', (size,)).fetchall()]
+            self.store.load(table, {item_id: views or 0 for item_id, views in top}, latest)
+
+    def _on_movie_added(self, sender, item, **kwargs):
+        self._safe(self._add_items, 'movies', [item])
+
+    def _on_series_added(self, sender, item, **kwargs):
+        self._safe(self._add_items, 'tv_series', [item])
+
+    def _on_bulk_written(self, sender, table, inserted, **kwargs):
+        if table in TABLES and inserted:
+            self._safe(self._add_items, table, inserted)
+
+    def _add_items(self, table, items):
+        self.store.add_latest(table, [item['id'] for item in items])
+        self.store.add_new(table, {item['id']: item.get('views') or 0 for item in items})
+
+    def _on_views_flushed(self, sender, deltas, **kwargs):
+        for table, changed in deltas.items():
+            if table in TABLES and changed:
+                self._safe(self._apply_views, table, changed)
+
+    def _apply_views(self, table, changed):
+        ids = list(changed)
+        with self._pool(table).connection() as conn:
+            rows = conn.execute(
+                f'SELECT id, views FROM {table} WHERE id IN ({", ".join("?" for _ in ids)})', ids
+            ).fetchall()
+        self.store.update_views(table, dict(rows))
+        self.store.add_window_views(table, changed)
+
+    def _failed(self, message):
+        if self._failing:
+            logger.debug(message, exc_info=True)
+        else:
+            self._failing = True
+            logger.exception(message)
+
+    def _succeeded(self):
+        if self._failing:
+            self._failing = False
+            logger.info("Leaderboard store recovered")
+
+    def _safe(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception:
+            self._failed("Leaderboard update failed")
+        else:
+            self._succeeded()
+
+    def _ids(self, board, table, hours=None):
+        try:
+            if board == 'latest':
+                ids = self.store.latest(table)
+            else:
+                ids = self.store.most_viewed(table, hours)
+        except Exception:
+            self._failed("Leaderboard read failed, falling back to SQL")
+            return None
+        self._succeeded()
+        return ids
+
+    def _fallback(self, conn, board, table, hours, columns=None):
+        cursor = conn.cursor()
+        names = select_list(columns)
+        if board == 'latest':
+            cursor.execute(f'SELECT {names} FROM {table} ORDER BY id DESC LIMIT ?', (self.store.size,))
+        elif hours is None:
+            cursor.execute(f'SELECT {names} FROM {table} ORDER BY views DESC, id DESC LIMIT ?', (self.store.size,))
+        else:
+            cursor.execute(f'SELECT {names} FROM {table} WHERE 0')
+        return cursor, cursor.fetchall()
+
+    def rows(self, conn, board, table, window='all', columns=None):
+        """Return ``(cursor, rows)`` for a ranking, hydrated by primary key in rank order."""
+        hours = WINDOWS[window]
+        ids = self._ids(board, table, hours)
+        if ids is None:
+            return self._fallback(conn, board, table, hours, columns)
+        return hydrate(conn, table, ids, columns)
+
+
+def hydrate(conn, table, ids, columns=None):
+    """Rows for ``ids`` in that order; ``columns`` must include ``id``."""
+    cursor = conn.cursor()
+    if not ids:
+        cursor.execute(f'SELECT {select_list(columns)} FROM {table} WHERE 0')
+        return cursor, []
+    cursor.execute(f'SELECT {select_list(columns)} FROM {table} WHERE id IN ({", ".join("?" for _ in ids)})', ids)
+    id_index = [col[0] for col in cursor.description].index('id')
+    by_id = {row[id_index]: row for row in cursor.fetchall()}
+    return cursor, [by_id[item_id] for item_id in ids if item_id in by_id]
+
+
+leaderboards = Leaderboards()
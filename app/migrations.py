@@ -0,0 +1,240 @@
+import logging
+import sqlite3
+from app.genres import GENRE_TABLES, genre_table_steps
+
+# Each database tracks the last applied migration in PRAGMA user_version.
+# A migration step is either a SQL statement or a callable taking a cursor;
+# all steps of one migration run inside a single IMMEDIATE transaction so
+# concurrently starting workers apply it exactly once.
+
+logger = logging.getLogger(__name__)
+
+
+def _fts_steps(table, fts):
+    return [
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            title_eng, description,
+            content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, title_eng, description)
+            VALUES (new.id, new.title_eng, new.description);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title_eng, description)
+            VALUES ('delete', old.id, old.title_eng, old.description);
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title_eng, description ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title_eng, description)
+            VALUES ('delete', old.id, old.title_eng, old.description);
+            INSERT INTO {fts}(rowid, title_eng, description)
+            VALUES (new.id, new.title_eng, new.description);
+        END
+        ''',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+# Catalog aggregates for the admin dashboard, one row per (table, dimension, bucket):
+# dimension 'total' (bucket ''), 'year' (bucket = year, '' when unknown) and 'genre'.
+# Triggers keep them exact on every write; rebuild_stats() recomputes them from scratch.
+STATS_TABLE = 'catalog_stats'
+
+
+def _stats_upsert(source, dimension, bucket, items, views):
+    return f'''
+            INSERT INTO {STATS_TABLE} (source, dimension, bucket, items, views)
+            VALUES ('{source}', '{dimension}', {bucket}, {items}, {views})
+            ON CONFLICT (source, dimension, bucket)
+            DO UPDATE SET items = items + excluded.items, views = views + excluded.views;
+'''
+
+
+def _stats_genre_views(table, item_id, delta):
+    join_table, fk = GENRE_TABLES[table]
+    return f'''
+            UPDATE {STATS_TABLE} SET views = views + ({delta})
+            WHERE source = '{table}' AND dimension = 'genre'
+              AND bucket IN (SELECT genre FROM {join_table} WHERE {fk} = {item_id});
+'''
+
+
+def _stats_table_step():
+    return f'''
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            source TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            bucket NOT NULL COLLATE NOCASE,
+            items INTEGER NOT NULL DEFAULT 0,
+            views INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (source, dimension, bucket)
+        ) WITHOUT ROWID
+    '''
+
+
+def _stats_steps(table):
+    join_table, fk = GENRE_TABLES[table]
+    new_views = 'COALESCE(new.views, 0)'
+    old_views = 'COALESCE(old.views, 0)'
+    delta = f'{new_views} - {old_views}'
+    return [
+        _stats_table_step(),
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_ai AFTER INSERT ON {table} BEGIN
+            {_stats_upsert(table, 'total', "''", 1, new_views)}
+            {_stats_upsert(table, 'year', "COALESCE(new.year, '')", 1, new_views)}
+        END
+        ''',
+        # BEFORE, so the genre rows removed by {join_table}_ad are still there
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_bd BEFORE DELETE ON {table} BEGIN
+            {_stats_genre_views(table, 'old.id', f'-{old_views}')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_ad AFTER DELETE ON {table} BEGIN
+            {_stats_upsert(table, 'total', "''", -1, f'-{old_views}')}
+            {_stats_upsert(table, 'year', "COALESCE(old.year, '')", -1, f'-{old_views}')}
+        END
+        ''',
+        # view flushes: same year, only the views move
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_au_views AFTER UPDATE OF views, year ON {table}
+        WHEN old.year IS new.year AND old.views IS NOT new.views BEGIN
+            {_stats_upsert(table, 'total', "''", 0, delta)}
+            {_stats_upsert(table, 'year', "COALESCE(new.year, '')", 0, delta)}
+            {_stats_genre_views(table, 'new.id', delta)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_stats_au_year AFTER UPDATE OF views, year ON {table}
+        WHEN old.year IS NOT new.year BEGIN
+            {_stats_upsert(table, 'total', "''", 0, delta)}
+            {_stats_upsert(table, 'year', "COALESCE(old.year, '')", -1, f'-{old_views}')}
+            {_stats_upsert(table, 'year', "COALESCE(new.year, '')", 1, new_views)}
+            {_stats_genre_views(table, 'new.id', delta)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {join_table}_stats_ai AFTER INSERT ON {join_table} BEGIN
+            {_stats_upsert(table, 'genre', 'new.genre', 1, f'COALESCE((SELECT views FROM {table} WHERE id = new.{fk}), 0)')}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {join_table}_stats_ad AFTER DELETE ON {join_table} BEGIN
+            {_stats_upsert(table, 'genre', 'old.genre', -1, f'-COALESCE((SELECT views FROM {table} WHERE id = old.{fk}), 0)')}
+        END
+        ''',
+        lambda cursor: rebuild_stats(cursor, table),
+    ]
+
+
+def _episode_stats_steps():
+    return [
+        _stats_table_step(),
+        f'''
+        CREATE TRIGGER IF NOT EXISTS episodes_stats_ai AFTER INSERT ON episodes BEGIN
+            {_stats_upsert('episodes', 'total', "''", 1, 0)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS episodes_stats_ad AFTER DELETE ON episodes BEGIN
+            {_stats_upsert('episodes', 'total', "''", -1, 0)}
+        END
+        ''',
+        lambda cursor: rebuild_stats(cursor, 'episodes'),
+    ]
+
+
+def expected_stats(cursor, table):
+    """The aggregates of ``table`` computed from its rows: {(dimension, bucket): (items, views)}."""
+    if table == 'episodes':
+        return {('total', ''): (cursor.execute('SELECT COUNT(*) FROM episodes').fetchone()[0], 0)}
+    join_table, fk = GENRE_TABLES[table]
+    stats = {}
+    for items, views in cursor.execute(f'SELECT COUNT(*), COALESCE(SUM(views), 0) FROM {table}').fetchall():
+        stats[('total', '')] = (items, views)
+    for year, items, views in cursor.execute(
+            f"SELECT COALESCE(year, ''), COUNT(*), COALESCE(SUM(views), 0) FROM {table} GROUP BY 1").fetchall():
+        stats[('year', year)] = (items, views)
+    # genres keep the casing of their first occurrence, like the join table
+    for genre, items, views in cursor.execute(f'''
+            SELECT g.genre, COUNT(*), COALESCE(SUM(t.views), 0)
+            FROM {join_table} g JOIN {table} t ON t.id = g.{fk}
+            GROUP BY g.genre COLLATE NOCASE''').fetchall():
+        stats[('genre', genre)] = (items, views)
+    return stats
+
+
+def rebuild_stats(cursor, table):
+    cursor.execute(f'DELETE FROM {STATS_TABLE} WHERE source = ?', (table,))
+    cursor.executemany(
+        f'INSERT INTO {STATS_TABLE} (source, dimension, bucket, items, views) VALUES (?, ?, ?, ?, ?)',
+        [(table, dimension, bucket, items, views)
+         for (dimension, bucket), (items, views) in expected_stats(cursor, table).items()],
+    )
+
+
+MOVIES_MIGRATIONS = [
+    (1, _fts_steps('movies', 'movies_fts')),
+    (2, genre_table_steps('movies')),
+    (3, ['CREATE INDEX IF NOT EXISTS idx_movies_views ON movies(views, id)']),
+    (4, ['CREATE INDEX IF NOT EXISTS idx_movies_imdb ON movies(imdb)']),
+    (5, _stats_steps('movies')),
+]
+
+SERIES_MIGRATIONS = [
+    (1, _fts_steps('tv_series', 'tv_series_fts')),
+    (2, genre_table_steps('tv_series')),
+    (3, ['CREATE INDEX IF NOT EXISTS idx_tv_series_views ON tv_series(views, id)']),
+    (4, ['CREATE INDEX IF NOT EXISTS idx_episodes_series ON episodes(series_id, season, episode_number)']),
+    (5, ['CREATE INDEX IF NOT EXISTS idx_tv_series_imdb ON tv_series(imdb)']),
+    (6, _stats_steps('tv_series') + _episode_stats_steps()),
+]
+
+
+def migrate(conn, migrations):
+    applied = []
+    for version, steps in migrations:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version <= current:
+                conn.rollback()
+                continue
+            cursor = conn.cursor()
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f'PRAGMA user_version={int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+def run_migrations(config):
+    for path, migrations in (
+        (config['DATABASE_PATH'], MOVIES_MIGRATIONS),
+        (config['DATABASE2_PATH'], SERIES_MIGRATIONS),
+    ):
+        conn = sqlite3.connect(path, timeout=config['DB_BUSY_TIMEOUT'], isolation_level=None)
+        try:
+            applied = migrate(conn, migrations)
+        finally:
+            conn.close()
+        if applied:
+            logger.info("Applied migrations %s to %s", applied, path)
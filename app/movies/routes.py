@@ -1,11 +1,20 @@
 from flask import Blueprint, request, jsonify
-from app.db import connect_db_api
+from app.db import get_db_api
 from flasgger import swag_from
-from app.extensions import cache
+from app.search import search_catalog, DEFAULT_LIMIT, MAX_LIMIT
+from app.genres import find_by_genres, requested_genres, MAX_GENRES_PER_QUERY
+from app.extensions import cached_view, sorted_by_views, normalize_list, normalize_text
+from app.pagination import paginated_response
+from app.fields import requested_fields, FIELDS_PARAMETER
+from app.batch import requested_ids, fetch_by_ids, batch_response, IDS_PARAMETER
+from app.view_counter import record_view, record_requested_view
+from app.leaderboards import leaderboards, WINDOWS
+from app.utils.helpers import rows_response, stream_rows
 
 movies_bp = Blueprint('movies_bp', __name__)
 
 @movies_bp.route("/by-id", methods=["GET"])
+@cached_view('movies.by_id', generations=('movies',), on_hit=lambda: record_requested_view('movies'))
 
 @swag_from({
     'tags': ['Movies'],
@@ -23,29 +32,71 @@ def by_id_movie():
     if not id_param or not id_param.isdigit():
         return jsonify({"error": "Invalid or missing id parameter"}), 400
 
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM movies WHERE id=?", (int(id_param),))
-    columns = [col[0] for col in cursor.description]
-    movie = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    rows = cursor.fetchall()
+    if rows:
+        record_view('movies', int(id_param))
 
-    return jsonify(movie)
+    return rows_response(cursor, rows)
+
+
+@movies_bp.route("/by-ids", methods=["GET"])
+@swag_from({
+    'tags': ['Movies'],
+    'description': 'Get several movies by ID in one request (watchlists). Returns {items, missing}: items in the requested order, missing lists the IDs that do not exist. Does not count as views.',
+    'parameters': [
+        IDS_PARAMETER,
+        FIELDS_PARAMETER
+    ],
+    'responses': {
+        200: {'description': 'Movies found and missing IDs'},
+        400: {'description': 'Invalid, missing or too many IDs'}
+    }
+})
+def movies_by_ids():
+    ids, error = requested_ids(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
+
+    conn = get_db_api()
+    cursor, rows, missing = fetch_by_ids(conn, 'movies', ids, columns)
+    return batch_response(cursor, rows, missing)
 
 
 @movies_bp.route("/all", methods=["GET"])
-@cache.cached(timeout=60)
+@cached_view('movies.all', generations=('movies', sorted_by_views('movies')), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Movies'],
-    'description': 'Get a paginated list of all movies',
+    'description': 'Get a paginated list of all movies. Pass cursor (empty for the first page) to get an {items, next_cursor} envelope.',
     'parameters': [
         {
             'name': 'page',
             'in': 'query',
             'type': 'integer',
-            'description': 'Page number',
+            'description': 'Page number (legacy, prefer cursor)',
             'required': False
-        }
+        },
+        {
+            'name': 'cursor',
+            'in': 'query',
+            'type': 'string',
+            'description': 'Opaque next_cursor token from the previous page',
+            'required': False
+        },
+        {
+            'name': 'sort',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['id', 'views'],
+            'description': 'Order by id (default) or by popularity',
+            'required': False
+        },
+        FIELDS_PARAMETER
     ],
     'responses': {
         200: {
@@ -61,30 +112,20 @@ def by_id_movie():
 })
 
 def all_movies():
-    
-    
-       
-    conn = connect_db_api()
-    cursor = conn.cursor()
-
-    page = int(request.args.get('page', 1))
-    items_per_page = 54
-    offset = (page - 1) * items_per_page
-
-    cursor.execute('SELECT * FROM movies LIMIT ? OFFSET ?', (items_per_page, offset))
-    columns = [col[0] for col in cursor.description]
-    movies = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-
-    return jsonify(movies)
+    conn = get_db_api()
+    return paginated_response(conn, 'movies')
 
 
 @movies_bp.route("/by-genre", methods=["GET"])
+@cached_view('movies.by_genre', generations=('movies',), normalizers={'genre': normalize_list, 'fields': normalize_list})
 @swag_from({
     'tags': ['Movies'],
-    'description': 'Search movies by genre.',
+    'description': 'Find movies by one or more genres.',
     'parameters': [
-        {'name': 'genre', 'in': 'query', 'type': 'string', 'description': 'Genre of the movies to search for', 'required': True}
+        {'name': 'genre', 'in': 'query', 'type': 'string', 'description': 'Genre name; repeat the parameter or separate several genres with commas', 'required': True},
+        {'name': 'match', 'in': 'query', 'type': 'string', 'enum': ['any', 'all'], 'description': 'Return movies having any (default) or all of the genres', 'required': False},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson'], 'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)', 'required': False},
+        FIELDS_PARAMETER
     ],
     'responses': {
         200: {'description': 'Matching movies found', 'content': {'application/json': {}}},
@@ -93,26 +134,34 @@ def all_movies():
     }
 })
 def movies_by_genre():
-    genre = request.args.get('genre')
-    if not genre:
+    genres = requested_genres(request.args)
+    if not genres:
         return jsonify({"error": "Genre is required"}), 400
+    if len(genres) > MAX_GENRES_PER_QUERY:
+        return jsonify({"error": f"At most {MAX_GENRES_PER_QUERY} genres are allowed"}), 400
 
-    conn = connect_db_api()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM movies WHERE genres LIKE ?", ('%' + genre + '%',))
-    columns = [col[0] for col in cursor.description]
-    movies = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    match = request.args.get('match', 'any')
+    if match not in ('any', 'all'):
+        return jsonify({"error": "match must be 'any' or 'all'"}), 400
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(movies)
+    conn = get_db_api()
+    cursor = find_by_genres(conn, 'movies', genres, match, columns=columns)
+    return stream_rows(cursor)
 
 
 @movies_bp.route("/search", methods=["GET"])
+@cached_view('movies.search', generations=('movies',), normalizers={'query': normalize_text, 'fields': normalize_list})
 @swag_from({
     'tags': ['Movies'],
-    'description': 'Search movies by title.',
+    'description': 'Full-text search movies by title and description, ranked by relevance. Words are prefix-matched.',
     'parameters': [
-        {'name': 'query', 'in': 'query', 'type': 'string', 'description': 'Movie title to search', 'required': True}
+        {'name': 'query', 'in': 'query', 'type': 'string', 'description': 'Movie title to search', 'required': True},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'description': 'Maximum number of ranked results (default 54, max 200)', 'required': False},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson'], 'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)', 'required': False},
+        FIELDS_PARAMETER
     ],
     'responses': {
         200: {'description': 'Matching movies'}
@@ -122,50 +171,57 @@ def search_movies():
     query = request.args.get('query')
     if not query:
         return jsonify({"error": "Query is required"}), 400
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
 
-    conn = connect_db_api()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM movies WHERE title_eng LIKE ?", ('%' + query + '%',))
-    columns = [col[0] for col in cursor.description]
-    movies = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-
-    return jsonify(movies)
+    conn = get_db_api()
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    cursor = search_catalog(conn, 'movies', query, limit, columns=columns)
+    return stream_rows(cursor)
 
 
 @movies_bp.route("/most-viewed", methods=["GET"])
+@cached_view('movies.most_viewed', generations=('movies', 'movies:views'), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Movies'],
-    'description': 'Get the most viewed movies.',
+    'description': 'Get the most viewed movies, all time or over a recent window.',
+    'parameters': [
+        {'name': 'window', 'in': 'query', 'type': 'string', 'enum': ['all', '24h', '7d'], 'description': 'Ranking window (default all)', 'required': False},
+        FIELDS_PARAMETER
+    ],
     'responses': {
         200: {'description': 'List of most viewed movies'}
     }
 })
 def most_viewed_movies():
-    conn = connect_db_api()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM movies ORDER BY views DESC LIMIT 54")
-    columns = [col[0] for col in cursor.description]
-    movies = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    window = request.args.get('window', 'all')
+    if window not in WINDOWS:
+        return jsonify({"error": f"window must be one of: {', '.join(WINDOWS)}"}), 400
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(movies)
+    conn = get_db_api()
+    cursor, rows = leaderboards.rows(conn, 'most_viewed', 'movies', window, columns=columns)
+    return rows_response(cursor, rows)
 
 
 @movies_bp.route("/latest", methods=["GET"])
+@cached_view('movies.latest', generations=('movies',), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Movies'],
     'description': 'Get the latest movies added.',
+    'parameters': [FIELDS_PARAMETER],
     'responses': {
         200: {'description': 'List of latest movies'}
     }
 })
 def latest_movies():
-    conn = connect_db_api()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM movies ORDER BY id DESC LIMIT 54")
-    columns = [col[0] for col in cursor.description]
-    movies = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    columns, error = requested_fields('movies')
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(movies)
+    conn = get_db_api()
+    cursor, rows = leaderboards.rows(conn, 'latest', 'movies', columns=columns)
+    return rows_response(cursor, rows)
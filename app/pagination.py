@@ -0,0 +1,118 @@
+import base64
+import json
+from flask import request, jsonify
+from app.utils.helpers import row_layout, dumps_json, json_bytes_response
+from app.fields import requested_fields, select_list
+
+PAGE_SIZE = 54
+
+# sort name -> (ORDER BY clause, keyset columns, comparison for the next page)
+SORTS = {
+    'id': ('id ASC', ('id',), '>'),
+    'views': ('views DESC, id DESC', ('views', 'id'), '<'),
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort, key):
+    raw = json.dumps({'s': sort, 'k': list(key)}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(token, sort, columns=None):
+    columns = SORTS[sort][1] if columns is None else columns
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        key = data['k']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid cursor')
+    if data.get('s') != sort or not isinstance(key, list) or len(key) != len(columns) \
+            or not all(isinstance(value, int) for value in key):
+        raise InvalidCursor('Cursor does not match the requested sort')
+    return key
+
+
+def _page_start_key(cursor, table, sort, page, page_size):
+    """Resolve a legacy ``page`` number to the keyset of the row just before it.
+
+    The skip still walks ``(page - 1) * page_size`` entries, but only over the
+    sort index, so no table rows are read or decoded for the skipped pages.
+    """
+    order, columns, _ = SORTS[sort]
+    cursor.execute(
+        f'SELECT {", ".join(columns)} FROM {table} ORDER BY {order} LIMIT 1 OFFSET ?',
+        ((page - 1) * page_size - 1,),
+    )
+    return cursor.fetchone()
+
+
+def keyset_page(conn, table, sort='id', after=None, page=None, page_size=PAGE_SIZE, columns=None):
+    """Fetch one page ordered by ``sort`` starting after the keyset ``after``.
+
+    ``columns`` (default all) must include the keyset columns of ``sort``.
+
+    Returns ``(cursor, rows, next_key)`` where ``next_key`` is the keyset of
+    the last row when more rows follow, else ``None``.
+    """
+    order, key_columns, op = SORTS[sort]
+    cursor = conn.cursor()
+
+    if after is None and page and page > 1:
+        after = _page_start_key(cursor, table, sort, page, page_size)
+        if after is None:
+            cursor.execute(f'SELECT {select_list(columns)} FROM {table} WHERE 0')
+            return cursor, [], None
+
+    where = ''
+    params = []
+    if after is not None:
+        where = f'WHERE ({", ".join(key_columns)}) {op} ({", ".join("?" for _ in key_columns)})'
+        params.extend(after)
+
+    cursor.execute(f'SELECT {select_list(columns)} FROM {table} {where} ORDER BY {order} LIMIT ?', (*params, page_size + 1))
+    rows = cursor.fetchall()
+
+    next_key = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        names = [col[0] for col in cursor.description]
+        next_key = [rows[-1][names.index(name)] for name in key_columns]
+    return cursor, rows, next_key
+
+
+def paginated_response(conn, table):
+    """Serve a listing page from either a ``cursor`` token or a legacy ``page``.
+
+    Requests carrying ``cursor`` (an empty value starts at the beginning) get an
+    ``{"items": [...], "next_cursor": ...}`` envelope; legacy ``page`` requests
+    keep the plain array body. Both expose the next token in ``X-Next-Cursor``.
+    """
+    sort = request.args.get('sort', 'id')
+    if sort not in SORTS:
+        return jsonify({"error": f"sort must be one of: {', '.join(SORTS)}"}), 400
+
+    token = request.args.get('cursor')
+    try:
+        after = decode_cursor(token, sort) if token else None
+    except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+    page = request.args.get('page', 1, type=int)
+    columns, error = requested_fields(table, required=SORTS[sort][1])
+    if error:
+        return jsonify({"error": error}), 400
+
+    cursor, rows, next_key = keyset_page(conn, table, sort, after, page, columns=columns)
+    items = row_layout(cursor).encode_rows(rows)
+    next_cursor = encode_cursor(sort, next_key) if next_key else None
+
+    if token is not None:
+        response = json_bytes_response(b'{"items":' + items + b',"next_cursor":' + dumps_json(next_cursor) + b'}')
+    else:
+        response = json_bytes_response(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
@@ -0,0 +1,159 @@
+import logging
+import threading
+from flask import request
+from flask_socketio import join_room, leave_room
+from app.extensions import socketio
+from app.genres import parse_genres
+from app.signals import movie_added, series_added, episode_added, bulk_written
+
+logger = logging.getLogger(__name__)
+
+MAX_GENRE_LENGTH = 64
+
+# fields sent to clients; descriptions stay behind the REST endpoints
+EVENT_FIELDS = {
+    'movie_added': ('id', 'title_eng', 'imdb', 'year', 'genres', 'poster'),
+    'series_added': ('id', 'title_eng', 'imdb', 'year', 'genres', 'poster'),
+    'episode_added': ('id', 'series_id', 'title_eng', 'season', 'episode_number', 'video_link'),
+}
+
+
+def genre_room(genre):
+    return 'genre:' + ' '.join(genre.lower().split())
+
+
+def series_room(series_id):
+    return f'series:{series_id}'
+
+
+def catalog_rooms(catalog, item):
+    return [catalog] + [genre_room(genre) for genre in parse_genres(item.get('genres'))]
+
+
+def requested_room(data):
+    """Room named by a subscribe/unsubscribe payload, or None if it is invalid."""
+    if not isinstance(data, dict):
+        return None
+    if 'series_id' in data:
+        series_id = data['series_id']
+        if type(series_id) is int and series_id > 0:
+            return series_room(series_id)
+        return None
+    if 'genre' in data:
+        genre = data['genre']
+        if isinstance(genre, str) and genre.strip() and len(genre) <= MAX_GENRE_LENGTH:
+            return genre_room(genre)
+        return None
+    if data.get('catalog') in ('movies', 'series'):
+        return data['catalog']
+    return None
+
+
+class Broadcaster:
+    """Publishes catalog additions to SocketIO rooms in coalesced batches.
+
+    Upload signals are buffered per ``(event, room)``; the first item of a
+    burst schedules a flush ``interval`` seconds later, which emits one
+    ``{"items": [...]}`` message per room and event. Rooms: ``movies`` and
+    ``series`` (everything), ``genre:<name>`` and ``series:<id>`` (episodes).
+    With ``SOCKETIO_MESSAGE_QUEUE`` set, emits go through the queue and reach
+    clients connected to any worker.
+    """
+
+    def __init__(self):
+        self.interval = 0.5
+        self.max_batch = 100
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._scheduled = False
+        self._stats = {"queued": 0, "messages": 0, "flushes": 0}
+
+    def init_app(self, app):
+        self.interval = app.config['REALTIME_BATCH_INTERVAL']
+        self.max_batch = app.config['REALTIME_MAX_BATCH']
+        app.extensions['broadcaster'] = self
+        movie_added.connect(self._on_movie_added, weak=False)
+        series_added.connect(self._on_series_added, weak=False)
+        episode_added.connect(self._on_episode_added, weak=False)
+        bulk_written.connect(self._on_bulk_written, weak=False)
+
+    def _on_movie_added(self, sender, item, **kwargs):
+        self.publish('movie_added', [(item, catalog_rooms('movies', item))])
+
+    def _on_series_added(self, sender, item, **kwargs):
+        self.publish('series_added', [(item, catalog_rooms('series', item))])
+
+    def _on_episode_added(self, sender, item, **kwargs):
+        self.publish('episode_added', [(item, [series_room(item['series_id'])])])
+
+    def _on_bulk_written(self, sender, table, inserted, **kwargs):
+        # a committed chunk is queued under one lock; rewritten rows are not announced
+        if table == 'episodes':
+            self.publish('episode_added', [(item, [series_room(item['series_id'])]) for item in inserted])
+        elif inserted:
+            catalog = 'movies' if table == 'movies' else 'series'
+            event = 'movie_added' if table == 'movies' else 'series_added'
+            self.publish(event, [(item, catalog_rooms(catalog, item)) for item in inserted])
+
+    def publish(self, event, entries):
+        """Queue ``(item, rooms)`` entries for the next coalesced flush."""
+        if not entries:
+            return
+        fields = EVENT_FIELDS[event]
+        with self._lock:
+            for item, rooms in entries:
+                payload = {name: item.get(name) for name in fields}
+                for room in rooms:
+                    self._pending.setdefault((event, room), []).append(payload)
+            self._stats["queued"] += len(entries)
+            schedule = not self._scheduled
+            self._scheduled = True
+        if schedule:
+            socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        socketio.sleep(self.interval)
+        with self._lock:
+            self._scheduled = False
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            if pending:
+                self._stats["flushes"] += 1
+        for (event, room), items in pending.items():
+            for start in range(0, len(items), self.max_batch):
+                try:
+                    socketio.emit(event, {"items": items[start:start + self.max_batch]}, to=room)
+                except Exception:
+                    logger.exception("Broadcast of %s to %s failed", event, room)
+                    continue
+                with self._lock:
+                    self._stats["messages"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending_rooms=len(self._pending))
+
+
+broadcaster = Broadcaster()
+
+
+@socketio.on('subscribe')
+def subscribe(data):
+    room = requested_room(data)
+    if room is None:
+        return {"error": "Pass one of series_id (integer), genre (string) or catalog ('movies' or 'series')"}
+    join_room(room, sid=request.sid)
+    return {"room": room}
+
+
+@socketio.on('unsubscribe')
+def unsubscribe(data):
+    room = requested_room(data)
+    if room is None:
+        return {"error": "Pass one of series_id (integer), genre (string) or catalog ('movies' or 'series')"}
+    leave_room(room, sid=request.sid)
+    return {"room": room}
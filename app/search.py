@@ -0,0 +1,85 @@
+import re
+from app.fields import select_list
+
+SEARCH_INDEXES = {
+    'movies': 'movies_fts',
+    'tv_series': 'tv_series_fts',
+}
+
+# bm25 column weights: a hit in the title counts far more than one in the description.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+DEFAULT_LIMIT = 54
+MAX_LIMIT = 200
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(text):
+    """Turn free user input into a safe FTS5 MATCH expression.
+
+    Every token is quoted so FTS5 operators in the input are treated as plain
+    words, and every token is prefix-matched so partially typed words from the
+    autocomplete still hit.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def search_catalog(conn, table, text, limit=DEFAULT_LIMIT, offset=0, columns=None):
+    fts = SEARCH_INDEXES[table]
+    match = fts_query(text)
+    cursor = conn.cursor()
+    if not match:
+        cursor.execute(f'SELECT {select_list(columns)} FROM {table} WHERE 0')
+        return cursor
+    cursor.execute(f'''
+        SELECT {select_list(columns, 't')} FROM {fts}
+        JOIN {table} t ON t.id = {fts}.rowid
+        WHERE {fts} MATCH ?
+        ORDER BY bm25({fts}, ?, ?)
+        LIMIT ? OFFSET ?
+    ''', (match, TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit, offset))
+    return cursor
+
+
+# rows returned by search_all, tagged with the table they came from
+UNIFIED_COLUMNS = ('id', 'title_eng', 'imdb', 'year', 'genres', 'poster', 'description', 'views')
+UNIFIED_SOURCES = (
+    ('movie', 'movies'),
+    ('series', 'tv_series'),
+)
+
+
+def search_all(conn, text, limit=DEFAULT_LIMIT, offset=0, columns=UNIFIED_COLUMNS):
+    """Search movies and series in one ranked query on a ``get_db_catalog()`` connection.
+
+    bm25 scores scale with each index's own term statistics, so a score is
+    only comparable within its table: every hit is ranked by its score
+    relative to the best hit of its table, and ties go to the more viewed title.
+    """
+    match = fts_query(text)
+    cursor = conn.cursor()
+    names = select_list(columns)
+    if not match:
+        cursor.execute(f"SELECT 'movie' AS type, {names} FROM movies WHERE 0")
+        return cursor
+    # views breaks ties, so the branches carry it even when it is not returned
+    inner = select_list(columns if 'views' in columns else (*columns, 'views'), 't')
+    branches = []
+    params = []
+    for kind, table in UNIFIED_SOURCES:
+        fts = SEARCH_INDEXES[table]
+        branches.append(f'''
+            SELECT '{kind}' AS type, {inner}, bm25({fts}, ?, ?) AS score
+            FROM {fts} JOIN {table} t ON t.id = {fts}.rowid
+            WHERE {fts} MATCH ?
+        ''')
+        params += [TITLE_WEIGHT, DESCRIPTION_WEIGHT, match]
+    cursor.execute(f'''
+        SELECT type, {names} FROM ({' UNION ALL '.join(branches)})
+        ORDER BY score / MIN(score) OVER (PARTITION BY type) DESC, views DESC
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    return cursor
@@ -1,40 +1,47 @@
 from flask import Blueprint, request, jsonify
-from app.db import connect_db_api2
+from app.db import get_db_api2
 from flasgger import swag_from
-from app.extensions import cache
+from app.search import search_catalog, DEFAULT_LIMIT, MAX_LIMIT
+from app.genres import find_by_genres, requested_genres, MAX_GENRES_PER_QUERY
+from app.extensions import cached_view, sorted_by_views, normalize_list, normalize_text
+from app.pagination import paginated_response
+from app.fields import requested_fields, FIELDS_PARAMETER
+from app.batch import requested_ids, fetch_by_ids, batch_response, IDS_PARAMETER
+from app.episodes import episodes_response, season_summary, episodes_by_series
+from app.view_counter import record_view, record_requested_view
+from app.leaderboards import leaderboards, WINDOWS
+from app.utils.helpers import rows_response, stream_rows
 
 series_bp = Blueprint('series_bp', __name__)
 
 
+def episodes_generation():
+    series_id = request.args.get('series_id')
+    return f'episodes:{series_id}' if series_id and series_id.isdigit() else None
+
+
 @series_bp.route("/all", methods=["GET"])
-@cache.cached(timeout=60)
+@cached_view('series.all', generations=('series', sorted_by_views('tv_series')), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Series'],
-    'description': 'Get a paginated list of all TV series.',
+    'description': 'Get a paginated list of all TV series. Pass cursor (empty for the first page) to get an {items, next_cursor} envelope.',
     'parameters': [
-        {'name': 'page', 'in': 'query', 'type': 'integer', 'description': 'Page number', 'required': False}
+        {'name': 'page', 'in': 'query', 'type': 'integer', 'description': 'Page number (legacy, prefer cursor)', 'required': False},
+        {'name': 'cursor', 'in': 'query', 'type': 'string', 'description': 'Opaque next_cursor token from the previous page', 'required': False},
+        {'name': 'sort', 'in': 'query', 'type': 'string', 'enum': ['id', 'views'], 'description': 'Order by id (default) or by popularity', 'required': False},
+        FIELDS_PARAMETER
     ],
     'responses': {
         200: {'description': 'List of TV series'}
     }
 })
 def all_series():
-    conn = connect_db_api2()
-    cursor = conn.cursor()
-
-    page = int(request.args.get('page', 1))
-    items_per_page = 54
-    offset = (page - 1) * items_per_page
-
-    cursor.execute('SELECT * FROM tv_series LIMIT ? OFFSET ?', (items_per_page, offset))
-    columns = [col[0] for col in cursor.description]
-    series_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
-
-    return jsonify(series_list)
+    conn = get_db_api2()
+    return paginated_response(conn, 'tv_series')
 
 
 @series_bp.route("/by-id", methods=["GET"])
+@cached_view('series.by_id', generations=('series',), on_hit=lambda: record_requested_view('tv_series'))
 @swag_from({
     'tags': ['Series'],
     'description': 'Get a TV series by its ID.',
@@ -51,21 +58,71 @@ def series_by_id():
     if not id_param or not id_param.isdigit():
         return jsonify({"error": "Invalid or missing id parameter"}), 400
 
-    conn = connect_db_api2()
+    conn = get_db_api2()
     cursor = conn.cursor()
     cursor.execute("SELECT * FROM tv_series WHERE id=?", (int(id_param),))
-    columns = [col[0] for col in cursor.description]
-    series = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    rows = cursor.fetchall()
+    if rows:
+        record_view('tv_series', int(id_param))
+
+    return rows_response(cursor, rows)
+
 
-    return jsonify(series)
+@series_bp.route("/by-ids", methods=["GET"])
+@swag_from({
+    'tags': ['Series'],
+    'description': 'Get several TV series by ID in one request (watchlists). Returns {items, missing}: items in the requested order, missing lists the IDs that do not exist. Does not count as views.',
+    'parameters': [
+        IDS_PARAMETER,
+        FIELDS_PARAMETER,
+        {'name': 'episodes', 'in': 'query', 'type': 'boolean', 'description': 'Embed each series\' episodes (in season order) as an episodes list', 'required': False}
+    ],
+    'responses': {
+        200: {'description': 'Series found and missing IDs'},
+        400: {'description': 'Invalid, missing or too many IDs'}
+    }
+})
+def series_by_ids():
+    ids, error = requested_ids(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+    columns, error = requested_fields('tv_series')
+    if error:
+        return jsonify({"error": error}), 400
+
+    conn = get_db_api2()
+    cursor, rows, missing = fetch_by_ids(conn, 'tv_series', ids, columns)
+    embed = None
+    if request.args.get('episodes', 'false').lower() in ('1', 'true', 'yes'):
+        embed = {'episodes': episodes_by_series(conn, set(ids) - set(missing))}
+    return batch_response(cursor, rows, missing, embed)
+
+
+@series_bp.route("/episodes/by-ids", methods=["GET"])
+@swag_from({
+    'tags': ['Series'],
+    'description': 'Get several episodes by ID in one request (continue watching). Returns {items, missing}: items in the requested order, missing lists the IDs that do not exist.',
+    'parameters': [IDS_PARAMETER],
+    'responses': {
+        200: {'description': 'Episodes found and missing IDs'},
+        400: {'description': 'Invalid, missing or too many IDs'}
+    }
+})
+def episodes_by_ids():
+    ids, error = requested_ids(request.args)
+    if error:
+        return jsonify({"error": error}), 400
+
+    conn = get_db_api2()
+    cursor, rows, missing = fetch_by_ids(conn, 'episodes', ids)
+    return batch_response(cursor, rows, missing)
 
 
 @series_bp.route("/episodes", methods=["GET"])
-@cache.cached(timeout=60)
+@cached_view('series.episodes', generations=(episodes_generation,))
 @swag_from({
     'tags': ['Series'],
-    'description': 'Get episodes for a series',
+    'description': 'Get episodes for a series, ordered by season and episode number. Pass cursor (empty for the first page) to page through long series with an {items, next_cursor} envelope.',
     'parameters': [
         {
             'name': 'series_id',
@@ -73,6 +130,17 @@ def series_by_id():
             'type': 'integer',
             'required': True,
             'description': 'ID of the TV series'
+        },
+        {'name': 'season', 'in': 'query', 'type': 'integer', 'description': 'Only return episodes of this season', 'required': False},
+        {'name': 'cursor', 'in': 'query', 'type': 'string', 'description': 'Opaque next_cursor token from the previous page', 'required': False},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'description': 'Episodes per page when paging with cursor (default 100, max 500)', 'required': False},
+        {
+            'name': 'format',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['json', 'ndjson'],
+            'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)',
+            'required': False
         }
     ],
     'responses': {
@@ -80,7 +148,7 @@ def series_by_id():
             'description': 'List of episodes'
         },
         400: {
-            'description': 'Invalid series ID'
+            'description': 'Invalid series ID, season or cursor'
         }
     }
 })
@@ -89,22 +157,46 @@ def series_episodes():
     if not series_id or not series_id.isdigit():
         return jsonify({"error": "Invalid or missing series_id parameter"}), 400
 
-    conn = connect_db_api2()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM episodes WHERE series_id=?", (int(series_id),))
-    columns = [col[0] for col in cursor.description]
-    episodes = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    season = request.args.get("season")
+    if season is not None and not season.isdigit():
+        return jsonify({"error": "Invalid season parameter"}), 400
+
+    conn = get_db_api2()
+    return episodes_response(conn, int(series_id), int(season) if season is not None else None)
 
-    return jsonify(episodes)
+
+@series_bp.route("/seasons", methods=["GET"])
+@cached_view('series.seasons', generations=(episodes_generation,))
+@swag_from({
+    'tags': ['Series'],
+    'description': 'Get the seasons of a series with the number of episodes in each.',
+    'parameters': [
+        {'name': 'series_id', 'in': 'query', 'type': 'integer', 'required': True, 'description': 'ID of the TV series'}
+    ],
+    'responses': {
+        200: {'description': 'List of {season, episodes} objects ordered by season', 'content': {'application/json': {}}},
+        400: {'description': 'Invalid series ID', 'content': {'application/json': {}}}
+    }
+})
+def series_seasons():
+    series_id = request.args.get("series_id")
+    if not series_id or not series_id.isdigit():
+        return jsonify({"error": "Invalid or missing series_id parameter"}), 400
+
+    conn = get_db_api2()
+    return rows_response(season_summary(conn, int(series_id)))
 
 
 @series_bp.route("/search", methods=["GET"])
+@cached_view('series.search', generations=('series',), normalizers={'query': normalize_text, 'fields': normalize_list})
 @swag_from({
     'tags': ['Series'],
-    'description': 'Search TV series by title.',
+    'description': 'Full-text search TV series by title and description, ranked by relevance. Words are prefix-matched.',
     'parameters': [
-        {'name': 'query', 'in': 'query', 'type': 'string', 'description': 'TV series title to search for', 'required': True}
+        {'name': 'query', 'in': 'query', 'type': 'string', 'description': 'TV series title to search for', 'required': True},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'description': 'Maximum number of ranked results (default 54, max 200)', 'required': False},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson'], 'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)', 'required': False},
+        FIELDS_PARAMETER
     ],
     'responses': {
         200: {'description': 'Matching TV series found', 'content': {'application/json': {}}},
@@ -117,52 +209,95 @@ def search_series():
     query = request.args.get('query')
     if not query:
         return jsonify({"error": "Query is required"}), 400
+    columns, error = requested_fields('tv_series')
+    if error:
+        return jsonify({"error": error}), 400
 
-    conn = connect_db_api2()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tv_series WHERE title_eng LIKE ?", ('%' + query + '%',))
-    columns = [col[0] for col in cursor.description]
-    series_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    conn = get_db_api2()
+    limit = min(max(request.args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    cursor = search_catalog(conn, 'tv_series', query, limit, columns=columns)
+    return stream_rows(cursor)
 
-    return jsonify(series_list)
+
+@series_bp.route("/by-genre", methods=["GET"])
+@cached_view('series.by_genre', generations=('series',), normalizers={'genre': normalize_list, 'fields': normalize_list})
+@swag_from({
+    'tags': ['Series'],
+    'description': 'Find TV series by one or more genres.',
+    'parameters': [
+        {'name': 'genre', 'in': 'query', 'type': 'string', 'description': 'Genre name; repeat the parameter or separate several genres with commas', 'required': True},
+        {'name': 'match', 'in': 'query', 'type': 'string', 'enum': ['any', 'all'], 'description': 'Return series having any (default) or all of the genres', 'required': False},
+        {'name': 'format', 'in': 'query', 'type': 'string', 'enum': ['json', 'ndjson'], 'description': 'ndjson streams one object per line (also selected by Accept: application/x-ndjson)', 'required': False},
+        FIELDS_PARAMETER
+    ],
+    'responses': {
+        200: {'description': 'Matching TV series found', 'content': {'application/json': {}}},
+        400: {'description': 'Genre is required', 'content': {'application/json': {}}},
+        500: {'description': 'Internal server error', 'content': {'application/json': {}}}
+    }
+})
+def series_by_genre():
+    genres = requested_genres(request.args)
+    if not genres:
+        return jsonify({"error": "Genre is required"}), 400
+    if len(genres) > MAX_GENRES_PER_QUERY:
+        return jsonify({"error": f"At most {MAX_GENRES_PER_QUERY} genres are allowed"}), 400
+
+    match = request.args.get('match', 'any')
+    if match not in ('any', 'all'):
+        return jsonify({"error": "match must be 'any' or 'all'"}), 400
+    columns, error = requested_fields('tv_series')
+    if error:
+        return jsonify({"error": error}), 400
+
+    conn = get_db_api2()
+    cursor = find_by_genres(conn, 'tv_series', genres, match, columns=columns)
+    return stream_rows(cursor)
 
 
 @series_bp.route("/most-viewed", methods=["GET"])
+@cached_view('series.most_viewed', generations=('series', 'tv_series:views'), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Series'],
-    'description': 'Get the most viewed TV series.',
+    'description': 'Get the most viewed TV series, all time or over a recent window.',
+    'parameters': [
+        {'name': 'window', 'in': 'query', 'type': 'string', 'enum': ['all', '24h', '7d'], 'description': 'Ranking window (default all)', 'required': False},
+        FIELDS_PARAMETER
+    ],
     'responses': {
         200: {'description': 'Most viewed TV series list', 'content': {'application/json': {}}},
         500: {'description': 'Internal server error', 'content': {'application/json': {}}}
     }
 })
 def most_viewed_series():
-    conn = connect_db_api2()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tv_series ORDER BY views DESC LIMIT 54")
-    columns = [col[0] for col in cursor.description]
-    series_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    window = request.args.get('window', 'all')
+    if window not in WINDOWS:
+        return jsonify({"error": f"window must be one of: {', '.join(WINDOWS)}"}), 400
+    columns, error = requested_fields('tv_series')
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(series_list)
+    conn = get_db_api2()
+    cursor, rows = leaderboards.rows(conn, 'most_viewed', 'tv_series', window, columns=columns)
+    return rows_response(cursor, rows)
 
 
 @series_bp.route("/latest", methods=["GET"])
+@cached_view('series.latest', generations=('series',), normalizers={'fields': normalize_list})
 @swag_from({
     'tags': ['Series'],
     'description': 'Get the latest TV series.',
+    'parameters': [FIELDS_PARAMETER],
     'responses': {
         200: {'description': 'Latest TV series list', 'content': {'application/json': {}}},
         500: {'description': 'Internal server error', 'content': {'application/json': {}}}
     }
 })
 def latest_series():
-    conn = connect_db_api2()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM tv_series ORDER BY id DESC LIMIT 54")
-    columns = [col[0] for col in cursor.description]
-    series_list = [dict(zip(columns, row)) for row in cursor.fetchall()]
-    conn.close()
+    columns, error = requested_fields('tv_series')
+    if error:
+        return jsonify({"error": error}), 400
 
-    return jsonify(series_list)
+    conn = get_db_api2()
+    cursor, rows = leaderboards.rows(conn, 'latest', 'tv_series', columns=columns)
+    return rows_response(cursor, rows)
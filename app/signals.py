@@ -0,0 +1,14 @@
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Catalog writes. sender: the app; kwargs: item=<the inserted row as a dict, including id>
+movie_added = _signals.signal('movie-added')
+series_added = _signals.signal('series-added')
+episode_added = _signals.signal('episode-added')
+# One committed chunk of a bulk upsert. sender: the app; kwargs: table=<catalog table>,
+# inserted=[new rows as dicts, including id], updated=[the submitted fields of rewritten rows, including id]
+bulk_written = _signals.signal('bulk-written')
+
+# sender: the app; kwargs: deltas={table: {item_id: added_views}}
+views_flushed = _signals.signal('views-flushed')
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify, session
-from app.db import connect_db_api, connect_db_api2
+from flask import Blueprint, request, jsonify, session, current_app
+from app.db import get_db_api, get_db_api2
 from functools import wraps
 from flasgger import swag_from
+from app.genres import sync_genres
+from app.signals import movie_added, series_added, episode_added
+from app.ingest import SPECS, BulkFormatError, ingest, iter_rows, summarize
 upload_bp = Blueprint('upload_bp', __name__)
 
 
@@ -54,14 +57,20 @@ def upload_movie():
     if not all([title_eng, imdb, year, genres, poster]):
         return jsonify({"error": "Missing fields"}), 400
 
-    conn = connect_db_api()
+    conn = get_db_api()
     cursor = conn.cursor()
     cursor.execute('''
         INSERT INTO movies (title_eng, imdb, year, genres, poster, description)
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (title_eng, imdb, year, genres, poster, description))
+    movie_id = cursor.lastrowid
+    sync_genres(cursor, 'movies', movie_id, genres)
     conn.commit()
-    conn.close()
+
+    movie_added.send(current_app._get_current_object(), item={
+        "id": movie_id, "title_eng": title_eng, "imdb": imdb, "year": year,
+        "genres": genres, "poster": poster, "description": description, "views": 0,
+    })
 
     return jsonify({"message": "Movie uploaded successfully"}), 201
 
@@ -108,14 +117,20 @@ def upload_series():
     if not all([title_eng, imdb, year, genres, poster]):
         return jsonify({"error": "Missing fields"}), 400
 
-    conn = connect_db_api2()
+    conn = get_db_api2()
     cursor = conn.cursor()
     cursor.execute('''
         INSERT INTO tv_series (title_eng, imdb, year, genres, poster, description)
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (title_eng, imdb, year, genres, poster, description))
+    series_id = cursor.lastrowid
+    sync_genres(cursor, 'tv_series', series_id, genres)
     conn.commit()
-    conn.close()
+
+    series_added.send(current_app._get_current_object(), item={
+        "id": series_id, "title_eng": title_eng, "imdb": imdb, "year": year,
+        "genres": genres, "poster": poster, "description": description, "views": 0,
+    })
 
     return jsonify({"message": "Series uploaded successfully"}), 201
 
@@ -160,13 +175,74 @@ def upload_episode():
     if not all([series_id, title_eng, season, episode_number, video_link]):
         return jsonify({"error": "Missing fields"}), 400
 
-    conn = connect_db_api2()
+    conn = get_db_api2()
     cursor = conn.cursor()
     cursor.execute('''
         INSERT INTO episodes (series_id, title_eng, season, episode_number, video_link)
         VALUES (?, ?, ?, ?, ?)
     ''', (series_id, title_eng, season, episode_number, video_link))
+    episode_id = cursor.lastrowid
     conn.commit()
-    conn.close()
+
+    episode_added.send(current_app._get_current_object(), item={
+        "id": episode_id, "series_id": series_id, "title_eng": title_eng,
+        "season": season, "episode_number": episode_number, "video_link": video_link,
+    })
 
     return jsonify({"message": "Episode uploaded successfully"}), 201
+
+
+def _bulk_upload(conn, table):
+    config = current_app.config
+    rows = iter_rows(request.stream, request.mimetype, config['BULK_MAX_ROW_BYTES'])
+    try:
+        results = ingest(conn, SPECS[table], rows, config['BULK_CHUNK_ROWS'], config['BULK_MAX_ROWS'],
+                         current_app._get_current_object())
+    except BulkFormatError as e:
+        return jsonify(dict(summarize(e.results), error=str(e))), 400
+    return jsonify(summarize(results)), 200
+
+
+BULK_DOC = {
+    'tags': ['Upload'],
+    'consumes': ['application/json', 'application/x-ndjson'],
+    'responses': {
+        200: {'description': 'Counts of inserted, updated, skipped and failed rows, plus per-row results '
+                             '({index, status, id} or {index, status, error}) in input order',
+              'content': {'application/json': {}}},
+        400: {'description': 'Malformed body; rows in chunks already committed are reported with the error',
+              'content': {'application/json': {}}},
+        403: {'description': 'No permission to upload', 'content': {'application/json': {}}}
+    }
+}
+
+
+@upload_bp.route("/movies/bulk", methods=["POST"])
+@admin_upload_permission_required
+@swag_from(dict(BULK_DOC, description=(
+    'Bulk upsert movies from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson). '
+    'Rows take the same fields as /upload/movie; an existing movie with the same imdb is updated.'
+)))
+def bulk_upload_movies():
+    return _bulk_upload(get_db_api(), 'movies')
+
+
+@upload_bp.route("/series/bulk", methods=["POST"])
+@admin_upload_permission_required
+@swag_from(dict(BULK_DOC, description=(
+    'Bulk upsert TV series from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson). '
+    'Rows take the same fields as /upload/series; an existing series with the same imdb is updated.'
+)))
+def bulk_upload_series():
+    return _bulk_upload(get_db_api2(), 'tv_series')
+
+
+@upload_bp.route("/episodes/bulk", methods=["POST"])
+@admin_upload_permission_required
+@swag_from(dict(BULK_DOC, description=(
+    'Bulk upsert episodes from a JSON array or an NDJSON stream (Content-Type: application/x-ndjson). '
+    'Rows take the same fields as /upload/episode; an existing episode with the same '
+    '(series_id, season, episode_number) is updated.'
+)))
+def bulk_upload_episodes():
+    return _bulk_upload(get_db_api2(), 'episodes')
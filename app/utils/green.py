@@ -0,0 +1,8 @@
+def in_green_thread():
+    """True when running in an eventlet green thread rather than a plain OS thread."""
+    try:
+        import greenlet
+    except ImportError:
+        return False
+    # green threads run as children of the hub; OS threads run in their main greenlet
+    return greenlet.getcurrent().parent is not None
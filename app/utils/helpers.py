@@ -0,0 +1,175 @@
+import json
+import threading
+from collections import OrderedDict
+from json.encoder import encode_basestring_ascii
+from operator import itemgetter
+from flask import current_app, request, Response
+from app.db import detach_db
+from app.compression import compress_stream
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+JSON_MIMETYPE = 'application/json'
+
+LAYOUT_CACHE_SIZE = 256
+
+_json_fallback = json.JSONEncoder(separators=(',', ':'), sort_keys=True).encode
+
+
+def _encode_value(value):
+    kind = type(value)
+    if kind is str:
+        return encode_basestring_ascii(value)
+    if value is None:
+        return 'null'
+    if kind is int or kind is float:
+        return repr(value)
+    return _json_fallback(value)
+
+
+class RowLayout:
+    """Column layout of one statement's result set, precompiled for encoding.
+
+    Keys are emitted sorted with compact separators. Without orjson, strings
+    are ASCII-escaped so the bytes match what ``jsonify`` produced for
+    ``dict(zip(columns, row))``; with orjson the JSON is the same but
+    non-ASCII characters are written as raw UTF-8 instead of ``\\u`` escapes.
+    """
+
+    __slots__ = ('columns', '_sorted', '_template')
+
+    def __init__(self, columns):
+        self.columns = tuple(columns)
+        order = sorted(range(len(self.columns)), key=self.columns.__getitem__)
+        if len(order) == 1:
+            index = order[0]
+            self._sorted = lambda row: (row[index],)
+        else:
+            self._sorted = itemgetter(*order)
+        self._template = '{' + ','.join(
+            encode_basestring_ascii(self.columns[i]).replace('%', '%%') + ':%s' for i in order
+        ) + '}'
+
+    def to_dict(self, row):
+        return dict(zip(self.columns, row))
+
+    def encode_row(self, row):
+        if orjson is not None:
+            return orjson.dumps(dict(zip(self.columns, row)), option=orjson.OPT_SORT_KEYS)
+        return (self._template % tuple([_encode_value(v) for v in self._sorted(row)])).encode()
+
+    def encode_rows(self, rows):
+        """Encode rows as a JSON array."""
+        if orjson is not None:
+            columns = self.columns
+            return orjson.dumps([dict(zip(columns, row)) for row in rows], option=orjson.OPT_SORT_KEYS)
+        template = self._template
+        pick = self._sorted
+        return ('[' + ','.join([
+            template % tuple([_encode_value(v) for v in pick(row)]) for row in rows
+        ]) + ']').encode()
+
+
+_layouts = OrderedDict()
+_layouts_lock = threading.Lock()
+
+
+def row_layout(cursor):
+    """Return the cached RowLayout for the statement last run on ``cursor``."""
+    description = cursor.description
+    with _layouts_lock:
+        layout = _layouts.get(description)
+        if layout is not None:
+            _layouts.move_to_end(description)
+            return layout
+    layout = RowLayout([col[0] for col in description])
+    with _layouts_lock:
+        _layouts[description] = layout
+        if len(_layouts) > LAYOUT_CACHE_SIZE:
+            _layouts.popitem(last=False)
+    return layout
+
+
+def dumps_json(value):
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_SORT_KEYS)
+    return _json_fallback(value).encode()
+
+
+def json_bytes_response(body, status=200):
+    return Response(body + b'\n', status=status, mimetype=JSON_MIMETYPE)
+
+
+def rows_response(cursor, rows=None):
+    """Encode the remaining rows of ``cursor`` (or ``rows``) straight to a JSON array response."""
+    layout = row_layout(cursor)
+    if rows is None:
+        rows = cursor.fetchall()
+    return json_bytes_response(layout.encode_rows(rows))
+
+
+def wants_ndjson():
+    if request.args.get('format') == 'ndjson':
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_rows(cursor, chunk_size=None):
+    """Serialize the rows of an executed cursor as a JSON array or NDJSON.
+
+    Rows are pulled with ``fetchmany`` and encoded one chunk at a time, so the
+    memory held per request is bounded by ``chunk_size`` rows instead of the
+    full result. A JSON result that fits in the first chunk is returned as a
+    regular (cacheable) response; anything larger is streamed, compressed
+    chunk by chunk when the client accepts it.
+    """
+    chunk_size = chunk_size or current_app.config['STREAM_CHUNK_ROWS']
+    layout = row_layout(cursor)
+    ndjson = wants_ndjson()
+
+    rows = cursor.fetchmany(chunk_size)
+    if not ndjson and len(rows) < chunk_size:
+        return rows_response(cursor, rows)
+
+    conn = cursor.connection
+    pool = detach_db(conn)
+    released = threading.Lock()
+
+    def release():
+        # runs when the body is exhausted and again when the response is
+        # closed, which also happens for HEAD requests and dropped clients
+        # that never start the generator
+        if not released.acquire(blocking=False):
+            return
+        cursor.close()
+        if pool is not None:
+            pool.release(conn)
+
+    def generate(rows):
+        try:
+            if ndjson:
+                while rows:
+                    yield b''.join([layout.encode_row(row) + b'\n' for row in rows])
+                    rows = cursor.fetchmany(chunk_size)
+            else:
+                yield b'['
+                separator = b''
+                while rows:
+                    yield separator + layout.encode_rows(rows)[1:-1]
+                    separator = b','
+                    rows = cursor.fetchmany(chunk_size)
+                yield b']\n'
+        finally:
+            release()
+
+    chunks, coding = compress_stream(generate(rows))
+    response = Response(chunks, mimetype=NDJSON_MIMETYPE if ndjson else JSON_MIMETYPE)
+    response.call_on_close(release)
+    if coding:
+        response.headers['Content-Encoding'] = coding
+    response.vary.add('Accept-Encoding')
+    return response
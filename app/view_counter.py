@@ -0,0 +1,167 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from flask import request
+from app.db import TABLE_POOLS
+from app.extensions import redis_client
+from app.signals import views_flushed
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('movies', 'tv_series')
+
+
+class ViewCounter:
+    """Write-behind buffer for the ``views`` column.
+
+    Request handlers only bump a counter (in process, or ``HINCRBY`` on Redis
+    when the cache is Redis so every worker shares one buffer). A background
+    thread periodically drains the buffer and applies all deltas for a table
+    with one ``executemany`` in a single transaction, so page views never take
+    SQLite's writer lock on the request path.
+    """
+
+    def __init__(self):
+        self._pending = {table: Counter() for table in TABLES}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._key_prefix = 'views:pending:'
+        self._app = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"recorded": 0, "flushes": 0, "flushed_rows": 0, "flush_errors": 0, "last_flush": None}
+
+    def init_app(self, app):
+        self._app = app
+        self._redis = redis_client(app)
+        self._key_prefix = app.config['VIEW_COUNTER_KEY_PREFIX']
+        app.extensions['view_counter'] = self
+        interval = app.config['VIEW_FLUSH_INTERVAL']
+        if interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='view-flusher', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def record(self, table, item_id, count=1):
+        with self._lock:
+            self._stats["recorded"] += count
+        if self._redis is not None:
+            try:
+                self._redis.hincrby(self._key_prefix + table, item_id, count)
+                return
+            except Exception as e:
+                logger.warning("Redis unavailable (%s), buffering views in process", e)
+        with self._lock:
+            self._pending[table][item_id] += count
+
+    def _drain_local(self, table):
+        with self._lock:
+            pending = self._pending[table]
+            self._pending[table] = Counter()
+        return pending
+
+    def _drain_redis(self, table):
+        """Claim and read the shared buffer, plus claims left behind by failed drains.
+
+        The pending hash is renamed to a unique ``:flushing:`` key and that key
+        is recorded in the ``:claims`` set in the same MULTI, so no other
+        worker can see the claim without its hash. Then every recorded claim
+        is read and deleted in one MULTI, so a claim is consumed exactly once
+        whichever worker gets to it, and one that could not be read stays
+        listed for the next flush instead of being dropped.
+        """
+        key = self._key_prefix + table
+        claims = f'{key}:claims'
+        claimed = f'{key}:flushing:{uuid.uuid4().hex}'
+        deltas = Counter()
+        try:
+            pipe = self._redis.pipeline()
+            pipe.rename(key, claimed)
+            pipe.sadd(claims, claimed)
+            # a failed RENAME (nothing recorded since the last flush) leaves a
+            # claim of a missing hash, which the loop below reads as empty
+            pipe.execute(raise_on_error=False)
+            for member in self._redis.smembers(claims):
+                member = member.decode() if isinstance(member, bytes) else member
+                pipe = self._redis.pipeline()
+                pipe.hgetall(member)
+                pipe.delete(member)
+                pipe.srem(claims, member)
+                values = pipe.execute()[0]
+                deltas.update({int(item_id): int(count) for item_id, count in values.items()})
+        except Exception as e:
+            logger.warning("Redis unavailable (%s), pending views stay claimed until the next flush", e)
+        return deltas
+
+    def flush(self):
+        """Apply all buffered views to SQLite; returns ``{table: {id: delta}}``."""
+        app = self._app
+        applied = {}
+        for table in TABLES:
+            deltas = self._drain_local(table)
+            try:
+                if self._redis is not None:
+                    deltas.update(self._drain_redis(table))
+                if not deltas:
+                    continue
+                pool = app.extensions['db_pools'][TABLE_POOLS[table]]
+                with pool.connection() as conn:
+                    with conn:
+                        conn.executemany(
+                            f'UPDATE {table} SET views = COALESCE(views, 0) + ? WHERE id = ?',
+                            [(count, item_id) for item_id, count in deltas.items()],
+                        )
+            except Exception:
+                logger.exception("Failed to flush views for %s, requeueing", table)
+                with self._lock:
+                    self._stats["flush_errors"] += 1
+                    self._pending[table].update(deltas)
+                continue
+            applied[table] = dict(deltas)
+
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += sum(len(d) for d in applied.values())
+            self._stats["last_flush"] = time.time()
+        if applied:
+            with app.app_context():
+                views_flushed.send(app, deltas=applied)
+        return applied
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("View flush failed")
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final view flush failed")
+
+    def stats(self):
+        with self._lock:
+            local = sum(sum(c.values()) for c in self._pending.values())
+            return dict(self._stats, pending_local=local, backend='redis' if self._redis is not None else 'local')
+
+
+view_counter = ViewCounter()
+
+
+def record_view(table, item_id):
+    view_counter.record(table, item_id)
+
+
+def record_requested_view(table, arg='id'):
+    """Record a view of the row named by the ``arg`` query parameter, if it is a valid id."""
+    value = request.args.get(arg, '')
+    if value.isascii() and value.isdigit():
+        record_view(table, int(value))
@@ -0,0 +1,112 @@
+"""Bytes on the wire vs. CPU for gzip/brotli at our common list payload sizes.
+
+For each payload (a JSON array of movie rows encoded like the API does) it
+prints the identity size and, per coding and level, the compressed size, the
+ratio and the time to compress it once. A precompressed cache hit pays that
+time once per cache fill; compressing on the fly pays it on every request.
+The streamed rows are compressed chunk by chunk with a sync flush after each
+chunk, which the last columns measure. Run from the repository root:
+
+    python benchmarks/bench_compression.py [--rows 54 500 5000]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+import zlib
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils.helpers import dumps_json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = ('the a of and to in is for on with as his her their after before when night city war love '
+         'star river king queen day family secret last first world dark light home road lost '
+         'young old story journey life death detective mission island summer winter time dream').split()
+GENRES = ('Drama', 'Action', 'Comedy', 'Thriller', 'Sci-Fi', 'Horror', 'Romance', 'Crime', 'Fantasy')
+
+
+def make_rows(count, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i + 1,
+            'title_eng': ' '.join(rnd.choice(WORDS).title() for _ in range(rnd.randint(1, 4))),
+            'imdb': f'tt{rnd.randint(100000, 9999999):07d}',
+            'year': rnd.randint(1950, 2025),
+            'genres': ', '.join(rnd.sample(GENRES, rnd.randint(1, 3))),
+            'poster': f'https://cdn.ucqire.com/posters/{rnd.getrandbits(64):016x}.jpg',
+            'description': ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(25, 60))).capitalize() + '.',
+            'views': rnd.randint(0, 100000),
+        })
+    return rows
+
+
+def gzip_once(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def gzip_stream(chunks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    out = [compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) for chunk in chunks]
+    out.append(compressor.flush())
+    return b''.join(out)
+
+
+def brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+    out = [compressor.process(chunk) + compressor.flush() for chunk in chunks]
+    out.append(compressor.finish())
+    return b''.join(out)
+
+
+def best_ms(fn, repeat=5):
+    number = 1
+    while True:
+        elapsed = timeit.timeit(fn, number=number)
+        if elapsed > 0.05 or number >= 1000:
+            break
+        number *= 4
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1000
+
+
+def codings():
+    for level in (1, 5, 6, 9):
+        yield f'gzip-{level}', (lambda body, level=level: gzip_once(body, level)), \
+            (lambda chunks, level=level: gzip_stream(chunks, level))
+    if brotli is not None:
+        for quality in (4, 6, 9, 11):
+            yield f'br-{quality}', (lambda body, q=quality: brotli.compress(body, mode=brotli.MODE_TEXT, quality=q)), \
+                (lambda chunks, q=quality: brotli_stream(chunks, q))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[54, 500, 5000])
+    parser.add_argument('--chunk-rows', type=int, default=500, help='rows per streamed chunk (STREAM_CHUNK_ROWS)')
+    args = parser.parse_args()
+    if brotli is None:
+        print('brotli is not installed, showing gzip only (pip install brotli)')
+
+    print(f"{'rows':>6} {'coding':>8} {'bytes':>10} {'ratio':>6} {'once ms':>9} {'stream bytes':>13} {'stream ms':>10}")
+    for count in args.rows:
+        rows = make_rows(count)
+        body = dumps_json(rows) + b'\n'
+        chunks = [dumps_json(rows[i:i + args.chunk_rows]) for i in range(0, count, args.chunk_rows)]
+        print(f'{count:>6} {"identity":>8} {len(body):>10,} {1:>6.2f} {0:>9.3f} {sum(map(len, chunks)):>13,} {0:>10.3f}')
+        for name, once, stream in codings():
+            data = once(body)
+            streamed = stream(chunks)
+            print(f'{"":>6} {name:>8} {len(data):>10,} {len(body) / len(data):>6.2f} {best_ms(lambda: once(body)):>9.3f} '
+                  f'{len(streamed):>13,} {best_ms(lambda: stream(chunks)):>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Per-row JSON encode cost: dict(zip()) + jsonify vs app.utils.helpers.RowLayout.
+
+The stdlib path must produce jsonify's exact bytes. orjson writes non-ASCII
+characters as raw UTF-8 rather than \\u escapes, so its output is only
+checked to decode to the same value.
+
+Run from the repository root:
+
+    python benchmarks/bench_serialization.py [--rows 54 1000 10000]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import Flask, jsonify
+from app.utils import helpers
+
+
+def make_cursor(count):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE movies (
+            id INTEGER PRIMARY KEY, title_eng TEXT, imdb TEXT, year INTEGER,
+            genres TEXT, poster TEXT, description TEXT, views INTEGER DEFAULT 0
+        )
+    ''')
+    conn.executemany(
+        'INSERT INTO movies (title_eng, imdb, year, genres, poster, description, views) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        [
+            (f'Movie {i}' if i % 3 else f'Café {i} – Épisode', f'tt{i:07d}', 1970 + i % 50, 'Drama, Action',
+             f'https://cdn.ucqire.com/posters/{i}.jpg',
+             'A reasonably long synopsis of the movie used to size the description field. ' * 4, i * 7)
+            for i in range(count)
+        ],
+    )
+    cursor = conn.execute('SELECT * FROM movies')
+    return cursor, cursor.fetchall()
+
+
+def current_approach(app, cursor, rows):
+    with app.app_context():
+        columns = [col[0] for col in cursor.description]
+        return jsonify([dict(zip(columns, row)) for row in rows]).get_data()
+
+
+def layout_approach(cursor, rows):
+    return helpers.row_layout(cursor).encode_rows(rows)
+
+
+def per_row_us(fn, count, repeat=5):
+    number = max(1, 20000 // count)
+    best = min(timeit.repeat(fn, number=number, repeat=repeat))
+    return best / number / count * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[54, 1000, 10000])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    fast = helpers.orjson
+    print(f"{'rows':>7} {'jsonify us/row':>15} {'stdlib us/row':>14} {'orjson us/row':>14}")
+    for count in args.rows:
+        cursor, rows = make_cursor(count)
+
+        baseline = current_approach(app, cursor, rows)
+        helpers.orjson = None
+        assert layout_approach(cursor, rows) + b'\n' == baseline
+        stdlib = per_row_us(lambda: layout_approach(cursor, rows), count)
+
+        fast_cost = float('nan')
+        if fast is not None:
+            helpers.orjson = fast
+            assert json.loads(layout_approach(cursor, rows)) == json.loads(baseline)
+            fast_cost = per_row_us(lambda: layout_approach(cursor, rows), count)
+
+        current = per_row_us(lambda: current_approach(app, cursor, rows), count)
+        print(f'{count:>7} {current:>15.2f} {stdlib:>14.2f} {fast_cost:>14.2f}')
+    helpers.orjson = fast
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""HTTP throughput of the production launch mode as gunicorn workers are added.
+
+Starts ``gunicorn -c gunicorn.conf.py wsgi:app`` once per worker count on
+copies of the databases in ``data/`` (the originals are never touched), drives
+it with keep-alive clients spread over several processes for a fixed time, and
+reports requests/s, latency percentiles and the speed-up over the first run.
+Run from the repository root:
+
+    python benchmarks/load_test.py [--workers 1 2 4] [--duration 15] [--cache null]
+
+``--cache null`` (the default) makes every request do its database and
+serialization work; ``--cache simple`` measures the per-worker cache path
+instead. Results only mean something when the load generator has cores to
+spare: use ``--client-procs`` and a machine with more cores than workers.
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+DEFAULT_PATHS = [
+    '/movies/all?page=1',
+    '/movies/latest',
+    '/movies/most-viewed',
+    '/movies/search?query=the',
+    '/series/all?page=1',
+    '/series/by-genre?genre=Drama',
+]
+
+CACHE_TYPES = {
+    'null': 'NullCache',
+    'simple': 'SimpleCache',
+    'redis': 'app.cache_backend.TwoTierCache',
+}
+
+
+def client_process(host, port, paths, threads, duration, results):
+    """Hammer the server from ``threads`` keep-alive connections; puts (count, errors, latencies) on ``results``."""
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    totals = {"count": 0, "errors": 0}
+    latencies = []
+
+    def worker(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        count = errors = 0
+        sample = []
+        i = offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 500
+            except (OSError, http.client.HTTPException):
+                ok = False
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+            elapsed = time.perf_counter() - started
+            count += 1
+            if not ok:
+                errors += 1
+            elif count % 4 == 0:
+                sample.append(elapsed)
+        conn.close()
+        with lock:
+            totals["count"] += count
+            totals["errors"] += errors
+            latencies.extend(sample)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put((totals["count"], totals["errors"], latencies))
+
+
+def run_load(port, paths, concurrency, client_procs, duration):
+    results = multiprocessing.Queue()
+    per_proc = max(1, concurrency // client_procs)
+    procs = [
+        multiprocessing.Process(target=client_process, args=('127.0.0.1', port, paths, per_proc, duration, results))
+        for _ in range(client_procs)
+    ]
+    started = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    count = errors = 0
+    latencies = []
+    for _ in procs:
+        c, e, lat = results.get()
+        count += c
+        errors += e
+        latencies.extend(lat)
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else float('nan')
+
+    return {"rps": count / elapsed, "requests": count, "errors": errors, "p50": pct(0.5), "p99": pct(0.99)}
+
+
+def wait_for_port(port, proc, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'gunicorn exited with status {proc.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not listen on port {port} within {timeout}s')
+
+
+def start_server(workers, port, data_dir, cache, log):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        BIND=f'127.0.0.1:{port}',
+        SECRET_KEY=os.environ.get('SECRET_KEY') or secrets.token_hex(32),
+        DATABASE_PATH=os.path.join(data_dir, 'database.db'),
+        DATABASE2_PATH=os.path.join(data_dir, 'data2.db'),
+        CACHE_TYPE=CACHE_TYPES[cache],
+        LOG_LEVEL='warning',
+    )
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=log, stderr=log,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    cpus = os.cpu_count() or 1
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, cpus} & set(range(1, cpus + 1))))
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--warmup', type=float, default=3)
+    parser.add_argument('--concurrency', type=int, default=64, help='open client connections')
+    parser.add_argument('--client-procs', type=int, default=max(1, cpus // 2), help='load generator processes')
+    parser.add_argument('--cache', choices=sorted(CACHE_TYPES), default='null')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--path', dest='paths', action='append', help='request path (repeatable)')
+    args = parser.parse_args()
+    paths = args.paths or DEFAULT_PATHS
+
+    data_dir = tempfile.mkdtemp(prefix='ucqire-load-')
+    for name in ('database.db', 'data2.db'):
+        shutil.copy(os.path.join(ROOT, 'data', name), os.path.join(data_dir, name))
+    log_path = os.path.join(data_dir, 'gunicorn.log')
+
+    print(f'{args.concurrency} connections from {args.client_procs} processes, {args.duration:.0f}s per run, '
+          f'cache={args.cache}, {cpus} cpus')
+    print(f'{"workers":>8}{"req/s":>12}{"speed-up":>10}{"p50 ms":>10}{"p99 ms":>10}{"errors":>9}')
+    baseline = None
+    try:
+        with open(log_path, 'w') as log:
+            for workers in args.workers:
+                port = args.port + workers
+                server = start_server(workers, port, data_dir, args.cache, log)
+                try:
+                    wait_for_port(port, server)
+                    run_load(port, paths, args.concurrency, args.client_procs, args.warmup)
+                    result = run_load(port, paths, args.concurrency, args.client_procs, args.duration)
+                finally:
+                    server.send_signal(signal.SIGTERM)
+                    server.wait(timeout=60)
+                baseline = baseline or result["rps"]
+                print(f'{workers:>8}{result["rps"]:>12,.0f}{result["rps"] / baseline:>9.2f}x'
+                      f'{result["p50"]:>10.1f}{result["p99"]:>10.1f}{result["errors"]:>9}')
+    except RuntimeError as e:
+        sys.exit(f'{e}; see {log_path}')
+    shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
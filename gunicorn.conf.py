@@ -0,0 +1,66 @@
+"""Production launch: N eventlet workers behind gunicorn.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Each worker imports and builds the app after the fork (no ``preload_app``), so
+every worker gets its own SQLite connection pools, native thread pool, view
+flusher and Redis connections; nothing opened in the master is shared. Pool
+sizes are per worker: the API holds up to ``WEB_CONCURRENCY * DB_POOL_SIZE``
+connections per database file.
+
+Signed-cookie sessions work on any worker as long as all of them share
+``SECRET_KEY`` (required here). Socket.IO emits go through
+``SOCKETIO_MESSAGE_QUEUE``, defaulting to the cache's Redis when more than one
+worker runs. Gunicorn does not route a client back to the worker holding its
+Socket.IO session, so with several workers clients must connect with the
+websocket transport only (or run one worker per port behind a proxy with
+sticky sessions).
+
+Database migrations run once in the master before any worker starts (unless
+``DB_AUTO_MIGRATE=0``), so workers boot without competing for the write lock
+while a long migration runs.
+"""
+import os
+import subprocess
+import sys
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'eventlet'
+# green threads per worker
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+preload_app = False
+timeout = int(os.getenv('WORKER_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+accesslog = os.getenv('ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+if workers > 1 and not os.getenv('SOCKETIO_MESSAGE_QUEUE'):
+    # read by app.config in each worker, which imports it after the fork
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'redis://{}:{}/{}'.format(
+        os.getenv('REDIS_HOST', 'localhost'), os.getenv('REDIS_PORT', 6379), os.getenv('REDIS_DB', 0))
+
+
+def on_starting(server):
+    if os.getenv('SECRET_KEY', 'default_secret_key') in ('', 'default_secret_key'):
+        raise SystemExit('SECRET_KEY must be set (and identical for every worker) in production')
+    server.log.info('Starting %d %s workers, Socket.IO queue: %s',
+                    workers, worker_class, os.getenv('SOCKETIO_MESSAGE_QUEUE') or 'none')
+    if os.getenv('DB_AUTO_MIGRATE', '1') == '1':
+        # in a child process: the master must not import the app its workers build after the fork
+        server.log.info('Applying database migrations')
+        result = subprocess.run([sys.executable, 'migrate.py'], cwd=os.path.dirname(os.path.abspath(__file__)))
+        if result.returncode:
+            raise SystemExit('Database migrations failed')
+    # read by app.config in each worker
+    os.environ['DB_AUTO_MIGRATE'] = '0'
+
+
+def post_worker_init(worker):
+    worker.log.info('Worker %s ready with its own connection pools', worker.pid)
@@ -0,0 +1,314 @@
+"""Offline catalog importer for movies, tv_series and episodes.
+
+Reads a CSV (with a header row), JSON array or NDJSON dump, parses and
+validates it in a process pool, and loads it through a single writer
+connection in fast-load mode: an in-memory rollback journal, no fsync, an
+exclusive lock, and the table's secondary indexes and triggers dropped for
+the load and rebuilt afterwards together with the full-text search, genre
+and statistics tables. The whole load is one transaction, so a failed
+import leaves the database as it was.
+
+Rows use the same fields as the upload endpoints; ``id`` (and ``views`` for
+movies and series) are kept when present, so episodes can reference series
+ids from the same dump.
+
+Fast-load mode is not crash safe (a power loss or kill mid-load can corrupt
+the file): stop the API and back up the database first. Run from the repository root:
+
+    python import_catalog.py movies dumps/movies.csv
+    python import_catalog.py tv_series dumps/series.ndjson --workers 8
+    python import_catalog.py episodes dumps/episodes.json --db data/data2.db
+"""
+import argparse
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from app.config import Config
+from app.genres import GENRE_TABLES, backfill_genres
+from app.ingest import SPECS, BulkFormatError, validate, JSONArrayReader
+from app.migrations import MOVIES_MIGRATIONS, SERIES_MIGRATIONS, migrate, rebuild_stats
+
+# table -> (default database, migrations creating its schema)
+TABLE_DATABASES = {
+    'movies': (Config.DATABASE_PATH, MOVIES_MIGRATIONS),
+    'tv_series': (Config.DATABASE2_PATH, SERIES_MIGRATIONS),
+    'episodes': (Config.DATABASE2_PATH, SERIES_MIGRATIONS),
+}
+
+# columns kept from the dump on top of the upload fields
+EXTRA_COLUMNS = {
+    'movies': ('id', 'views'),
+    'tv_series': ('id', 'views'),
+    'episodes': ('id',),
+}
+
+FTS_TABLES = {
+    'movies': 'movies_fts',
+    'tv_series': 'tv_series_fts',
+}
+
+FORMATS = {'.csv': 'csv', '.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+MAX_ERRORS_SHOWN = 10
+
+
+# parsing (runs in the worker processes)
+
+def _csv_value(name, value, integers):
+    if value == '':
+        return None
+    if name in integers:
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    return value
+
+
+def parse_batch(task):
+    """Decode and validate one batch; returns ``(rows, errors)``.
+
+    ``rows`` are value tuples in insert column order, ``errors`` are
+    ``(row_number, message)`` pairs.
+    """
+    table, fmt, header, start, items = task
+    spec = SPECS[table]
+    extras = EXTRA_COLUMNS[table]
+    integers = set(spec.integers) | set(extras)
+    rows = []
+    errors = []
+    for number, item in enumerate(items, start):
+        if fmt == 'csv':
+            row = {name: _csv_value(name, value, integers) for name, value in zip(header, item)}
+        elif fmt == 'ndjson':
+            if not item.strip():
+                continue
+            try:
+                row = json.loads(item)
+            except ValueError as e:
+                errors.append((number, f'invalid JSON: {e}'))
+                continue
+        else:
+            row = item
+        values, error = validate(spec, row)
+        if error is None:
+            extra = tuple(row.get(name) for name in extras)
+            if any(value is not None and type(value) is not int for value in extra):
+                error = f'{", ".join(extras)} must be integers'
+        if error is not None:
+            errors.append((number, error))
+            continue
+        rows.append(values + extra)
+    return rows, errors
+
+
+# reading (main process)
+
+def read_batches(path, table, fmt, batch_size):
+    """Yield parse tasks of ``batch_size`` raw rows; parsing itself is left to the workers."""
+    if fmt == 'json':
+        with open(path, 'rb') as f:
+            batch, start = [], 1
+            for number, (row, _) in enumerate(JSONArrayReader(f, 1 << 30), 1):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    yield table, fmt, None, start, batch
+                    batch, start = [], number + 1
+            if batch:
+                yield table, fmt, None, start, batch
+        return
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = None
+        if fmt == 'csv':
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader, [])]
+            lines = reader
+        else:
+            lines = f
+        batch, start = [], 1
+        for number, line in enumerate(lines, 1):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield table, fmt, header, start, batch
+                batch, start = [], number + 1
+        if batch:
+            yield table, fmt, header, start, batch
+
+
+def parsed_batches(tasks, workers):
+    """Parse tasks in order, keeping at most ``2 * workers`` batches in flight."""
+    if workers <= 1:
+        for task in tasks:
+            yield parse_batch(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(parse_batch, task))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+# loading (single writer)
+
+class Timer:
+    def __init__(self):
+        self.phases = []
+
+    def phase(self, name, started, rows=None):
+        self.phases.append((name, time.perf_counter() - started, rows))
+
+    def report(self, out, rows=None):
+        total = sum(seconds for _, seconds, _ in self.phases)
+        for name, seconds, count in self.phases + [('total', total, rows)]:
+            rate = f'{count / seconds:12,.0f} rows/s' if count and seconds else ''
+            out.write(f'{name:<28}{seconds:10.2f} s  {rate}\n')
+
+
+def _fast_load(conn):
+    # MEMORY rather than OFF keeps ROLLBACK working if the import fails
+    conn.execute('PRAGMA journal_mode=MEMORY')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA locking_mode=EXCLUSIVE')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-262144')
+
+
+def _deferred_objects(conn, table):
+    """Secondary indexes and triggers on ``table`` (and triggers on its genre table), to drop for the load and recreate after."""
+    join_table = GENRE_TABLES[table][0] if table in GENRE_TABLES else None
+    return conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL AND "
+        "((tbl_name = ? AND type IN ('index', 'trigger')) OR (tbl_name = ? AND type = 'trigger')) ORDER BY type",
+        (table, join_table),
+    ).fetchall()
+
+
+def load(conn, table, batches, timer, truncate=False, out=sys.stdout):
+    spec = SPECS[table]
+    columns = spec.columns + EXTRA_COLUMNS[table]
+    placeholders = ['COALESCE(?, 0)' if name == 'views' else '?' for name in columns]
+    insert = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(placeholders)})'
+
+    parents = None
+    if spec.parent is not None:
+        parent_table, parent_column = spec.parent
+        parents = {row[0] for row in conn.execute(f'SELECT id FROM {parent_table}')}
+        parent_index = columns.index(parent_column)
+
+    started = time.perf_counter()
+    conn.execute('BEGIN')
+    deferred = _deferred_objects(conn, table)
+    for kind, name, _ in deferred:
+        conn.execute(f'DROP {kind.upper()} {name}')
+    if truncate:
+        conn.execute(f'DELETE FROM {table}')
+    timer.phase('drop indexes/triggers', started)
+
+    loaded = rejected = 0
+    errors = []
+    write_seconds = 0.0
+    started = time.perf_counter()
+    for rows, batch_errors in batches:
+        if parents is not None:
+            orphans = [row for row in rows if row[parent_index] not in parents]
+            if orphans:
+                rows = [row for row in rows if row[parent_index] in parents]
+                batch_errors = batch_errors + [(None, f'{spec.parent[1]} {row[parent_index]} does not exist') for row in orphans]
+        written = time.perf_counter()
+        conn.executemany(insert, rows)
+        write_seconds += time.perf_counter() - written
+        loaded += len(rows)
+        rejected += len(batch_errors)
+        errors.extend(batch_errors[:MAX_ERRORS_SHOWN - len(errors)])
+    elapsed = time.perf_counter() - started
+    timer.phases.append(('read/parse/validate (wait)', elapsed - write_seconds, loaded + rejected))
+    timer.phases.append(('insert', write_seconds, loaded))
+
+    started = time.perf_counter()
+    for kind, name, sql in deferred:
+        if kind == 'index':
+            conn.execute(sql)
+    timer.phase('rebuild indexes', started, loaded)
+
+    if table in FTS_TABLES:
+        started = time.perf_counter()
+        fts = FTS_TABLES[table]
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        timer.phase('rebuild search index', started, loaded)
+
+    if table in GENRE_TABLES:
+        started = time.perf_counter()
+        join_table, _ = GENRE_TABLES[table]
+        conn.execute(f'DELETE FROM {join_table}')
+        backfill_genres(conn.cursor(), table)
+        timer.phase('rebuild genre table', started, loaded)
+
+    started = time.perf_counter()
+    rebuild_stats(conn.cursor(), table)
+    timer.phase('rebuild statistics', started, loaded)
+
+    for kind, name, sql in deferred:
+        if kind == 'trigger':
+            conn.execute(sql)
+    conn.execute('COMMIT')
+
+    out.write(f'{loaded:,} rows loaded into {table}, {rejected:,} rejected\n')
+    for number, message in errors:
+        out.write(f'  row {number}: {message}\n' if number else f'  {message}\n')
+    if rejected > len(errors):
+        out.write(f'  ... and {rejected - len(errors):,} more\n')
+    return loaded, rejected
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk-load a catalog dump into SQLite.')
+    parser.add_argument('table', choices=sorted(SPECS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='default: from the file extension')
+    parser.add_argument('--db', help='database file (default: the one the API reads the table from)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='parser processes (1 parses inline)')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--truncate', action='store_true', help='delete all existing rows of the table first')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or FORMATS.get(os.path.splitext(args.path)[1].lower())
+    if fmt is None:
+        parser.error('cannot tell the format from the file extension, pass --format')
+    default_db, migrations = TABLE_DATABASES[args.table]
+    db_path = args.db or default_db
+
+    timer = Timer()
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    migrate(conn, migrations)
+    journal_mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+    _fast_load(conn)
+    timer.phase('open/migrate', started)
+
+    try:
+        batches = parsed_batches(read_batches(args.path, args.table, fmt, args.batch_size), args.workers)
+        loaded, _ = load(conn, args.table, batches, timer, truncate=args.truncate)
+    except (BulkFormatError, OSError, UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+        sys.exit(f'import failed, nothing was written: {e}')
+    finally:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        started = time.perf_counter()
+        conn.execute('PRAGMA locking_mode=NORMAL')
+        conn.execute(f'PRAGMA journal_mode={journal_mode}')
+        conn.close()
+    timer.phase('restore journal', started)
+    timer.report(sys.stdout, loaded)
+
+
+if __name__ == '__main__':
+    main()
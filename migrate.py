@@ -0,0 +1,22 @@
+"""Apply pending database migrations without starting the API.
+
+gunicorn.conf.py runs this once in the master before the workers boot. Run
+from the repository root:
+
+    python migrate.py
+"""
+import logging
+from flask import Config as FlaskConfig
+from app.config import Config
+from app.migrations import run_migrations
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    config = FlaskConfig('')
+    config.from_object(Config)
+    run_migrations(config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""WSGI entry point for production servers (see gunicorn.conf.py); ``run.py`` is the dev server."""
+from app import create_app
+
+app = create_app()